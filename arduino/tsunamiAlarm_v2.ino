@@ -24,6 +24,19 @@ RH_ASK rf_driver;
 // I2C address selection
 uint8_t i2cAddress = LPS28DFW_I2C_ADDRESS_DEFAULT;
 
+// Serial output format
+// When false, each pressure reading is sent as a line of text: "device time (ms),sequence number,pressure (hPa)"
+// When true, each reading is sent as a binary frame (see sendBinaryFrame) - the dashboard's DataTransmitter must be created with framing="binary"
+const bool BINARY_FRAMING = false;
+
+// Binary frame layout (all values little endian, 14 bytes in total):
+// 2 sync bytes (0xA5 0x5A), uint16 sequence number, uint32 device time (ms), float32 pressure (hPa), uint16 CRC-16/CCITT of the 10 bytes before it
+const uint8_t FRAME_SYNC_1 = 0xA5;
+const uint8_t FRAME_SYNC_2 = 0x5A;
+
+// Number of the next pressure reading sent, so the dashboard can detect dropped readings
+uint16_t sample_sequence_number = 0;
+
 // Alarm constants
 const int ALARM_ALTERNATION_MAX = 24; // Maximum amount of alternations to play
 const int ALARM_ALTERNATE_LENGTH = 6; // Amount of 100ms between each alternation
@@ -89,8 +102,18 @@ void loop()
     // the pressure data, otherwise it will never update
     pressureSensor.getSensorData();
 
-    // Print temperature and pressure
-    Serial.println(pressureSensor.data.pressure.hpa);
+    // Send pressure to the dashboard, along with the time it was measured and its sequence number
+    if (BINARY_FRAMING == true) {
+      sendBinaryFrame(pressureSensor.data.pressure.hpa);
+    }
+    else {
+      Serial.print(millis());
+      Serial.print(",");
+      Serial.print(sample_sequence_number);
+      Serial.print(",");
+      Serial.println(pressureSensor.data.pressure.hpa);
+      sample_sequence_number++;
+    }
 
     // Check if alarm got sent while alarm is not currently on
     if (alarm_on == false) {
@@ -191,4 +214,49 @@ void activateOtherAlarm()
   // Send message
   const char *msg = "ACTIVATE";
   rf_driver.send((uint8_t *)msg, strlen(msg));
-}
\ No newline at end of file
+}
+
+//////////////////////////////////////////////
+// Sends a pressure reading as a binary frame
+void sendBinaryFrame(float pressure)
+{
+  uint8_t frame[14];
+  uint32_t device_time = millis();
+
+  // Sync bytes mark the start of the frame
+  frame[0] = FRAME_SYNC_1;
+  frame[1] = FRAME_SYNC_2;
+
+  // Copy sequence number, device time and pressure into the frame (the Arduino is little endian)
+  memcpy(&frame[2], &sample_sequence_number, 2);
+  memcpy(&frame[4], &device_time, 4);
+  memcpy(&frame[8], &pressure, 4);
+
+  // Add checksum of the frame contents so corrupted frames can be detected
+  uint16_t crc = crc16(&frame[2], 10);
+  memcpy(&frame[12], &crc, 2);
+
+  Serial.write(frame, sizeof(frame));
+  sample_sequence_number++;
+}
+
+//////////////////////////////////////////////
+// Calculates the CRC-16/CCITT checksum (polynomial 0x1021, starting value 0xFFFF) of some data
+uint16_t crc16(const uint8_t *data, size_t length)
+{
+  uint16_t crc = 0xFFFF;
+
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      if (crc & 0x8000) {
+        crc = (crc << 1) ^ 0x1021;
+      }
+      else {
+        crc = crc << 1;
+      }
+    }
+  }
+
+  return crc;
+}
@@ -0,0 +1,166 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import threading
+from arduino_data import DataTransmitter
+from sample_channel import SampleChannel
+
+class AcquisitionProcess():
+    """
+        Runs a DataTransmitter and its tsunami detector in a separate process, which owns the serial port and sends the alarm.
+        Samples are streamed to the dashboard through a sample channel in shared memory, so the alarm does not have to wait for the GUI.
+        Has the same methods as DataTransmitter that the dashboard uses, so it can be given to the dashboard in place of one.
+    """
+
+    # How often in seconds the acquisition process checks for an alarm activation to report to the dashboard
+    EVENT_INTERVAL = 0.05
+
+    def __init__(self, framing="text", channel_capacity=SampleChannel.DEFAULT_CAPACITY, share_name=None, record_directory=None):
+
+        self.framing = framing
+
+        # Create sample channel in shared memory
+        self.channel_memory = SharedMemory(create=True, size=SampleChannel.buffer_size(channel_capacity))
+        self.sample_channel = SampleChannel(channel_capacity, buffer=self.channel_memory.buf)
+
+        # Commands are sent to the acquisition process and answered through one pipe, events (e.g. alarm activations) come back through the other
+        self.command_connection, child_command_connection = multiprocessing.Pipe()
+        self.event_connection, child_event_connection = multiprocessing.Pipe(duplex=False)
+
+        self.process = multiprocessing.Process(target=run_acquisition, daemon=True,
+                                               args=(self.channel_memory.name, channel_capacity, framing, share_name, record_directory, child_command_connection, child_event_connection))
+
+        # Latest state reported by the acquisition process
+        self.serial_connected = False
+        self.dropped_samples = 0
+        self.pending_alarm = None
+
+        self.dashboard = None
+
+    def start(self):
+        """Start the acquisition process."""
+        self.process.start()
+
+    def run_command(self, *command):
+        """Sends a command to the acquisition process and returns its answer."""
+
+        self.command_connection.send(command)
+        return self.command_connection.recv()
+
+    def connect_serial(self, port, baud_rate):
+        """Attempt to connect the acquisition process to the serial port. Returns True if the port could be opened."""
+
+        self.serial_connected = self.run_command("connect_serial", port, baud_rate)
+        return self.serial_connected
+
+    def is_serial_connected(self):
+        """Returns True if serial is connected, or False if serial is not connected."""
+        return self.serial_connected
+
+    def send_alarm(self):
+        """Sends out the alarm to the connected arduino."""
+        self.run_command("send_alarm")
+
+    def configure_detection(self, calibrated_air_pressure, standing_water_level, alarm_threshold):
+        """Set the calibration and alarm threshold used by the tsunami detector."""
+        self.run_command("configure_detection", calibrated_air_pressure, standing_water_level, alarm_threshold)
+
+    def reset_alarm(self):
+        """Allow the tsunami detector to activate the alarm again."""
+
+        self.run_command("reset_alarm")
+        self.receive_events()
+        self.pending_alarm = None
+
+    def poll_alarm(self):
+        """If the alarm has been activated since the last call, returns (pressure, wave height) that activated it. Otherwise returns None."""
+
+        self.receive_events()
+
+        alarm = self.pending_alarm
+        self.pending_alarm = None
+        return alarm
+
+    def receive_events(self):
+        """Processes every event sent by the acquisition process."""
+
+        while self.event_connection.poll():
+            event = self.event_connection.recv()
+
+            if event[0] == "alarm":
+                self.pending_alarm = event[1]
+            elif event[0] == "status":
+                self.serial_connected, self.dropped_samples = event[1:]
+
+    def set_dashboard(self, dashboard):
+        """Set the dashboard this acquisition process is attached to."""
+        self.dashboard = dashboard
+
+    def stop(self):
+        """Stops the acquisition process and frees the shared memory."""
+
+        if self.process.is_alive():
+            self.run_command("stop")
+            self.process.join()
+
+        self.sample_channel.release()
+        self.channel_memory.close()
+        self.channel_memory.unlink()
+
+
+
+def run_acquisition(channel_memory_name, channel_capacity, framing, share_name, record_directory, command_connection, event_connection):
+    """Main function of the acquisition process. Reads the serial port in a thread, while answering commands from the dashboard."""
+
+    # Attach to the sample channel created by the dashboard's process
+    channel_memory = SharedMemory(name=channel_memory_name)
+
+    data_transmitter = DataTransmitter(dashboard=None, framing=framing, share_name=share_name, record_directory=record_directory)
+    data_transmitter.sample_channel = SampleChannel(channel_capacity, buffer=channel_memory.buf)
+
+    data_thread = threading.Thread(target=data_transmitter.data_loop)
+    data_thread.start()
+
+    last_status = None
+
+    while True:
+
+        # Wait for a command, checking for events in between
+        if command_connection.poll(AcquisitionProcess.EVENT_INTERVAL):
+            command, *arguments = command_connection.recv()
+
+            if command == "stop":
+                break
+            elif command == "connect_serial":
+                command_connection.send(data_transmitter.connect_serial(*arguments))
+            elif command == "send_alarm":
+                command_connection.send(data_transmitter.send_alarm())
+            elif command == "configure_detection":
+                command_connection.send(data_transmitter.configure_detection(*arguments))
+            elif command == "reset_alarm":
+                command_connection.send(data_transmitter.reset_alarm())
+            else:
+                command_connection.send(None)
+
+        # Report alarm activations to the dashboard (the alarm has already been sent by the data transmitter)
+        alarm = data_transmitter.poll_alarm()
+        if alarm != None:
+            event_connection.send(("alarm", alarm))
+
+        # Report changes to the serial connection and dropped samples
+        status = (data_transmitter.is_serial_connected(), data_transmitter.dropped_samples)
+        if status != last_status:
+            event_connection.send(("status",) + status)
+            last_status = status
+
+    # Stop reading data and detach from the sample channel
+    data_transmitter.stop()
+    data_thread.join()
+
+    data_transmitter.sample_channel.release()
+    channel_memory.close()
+
+    command_connection.send(None)
@@ -5,81 +5,307 @@
 #################### IMPORTS ####################
 import serial
 from serial.serialutil import SerialException
+import threading
+import struct
+import binascii
 import time
+from collections import deque
+from sample_channel import SampleChannel
+from detector import TsunamiDetector
+from shared_samples import SharedSampleRing
+from recorder import BackgroundRecorder
+from stage_timers import StageTimers
 
 class DataTransmitter():
     """Collects and sends data to/from a serial port, if able to connect to the serial port."""
 
-    def __init__(self, dashboard):
+    # Longest time in seconds a read waits for data before giving up, so the data loop can check if it should stop
+    READ_TIMEOUT = 0.5
+
+    def __init__(self, dashboard, framing="text", share_name=None, record_directory=None, stage_timers=None):
 
         self.serial_COM = None
         self.break_loop = False
 
         self.dashboard = dashboard
+
+        # Format the Arduino sends data in - "text" for a line of text per reading, or "binary" for binary frames
+        # Must match BINARY_FRAMING in tsunamiAlarm_v2.ino
+        if framing not in ("text", "binary"):
+            raise ValueError("Framing must be 'text' or 'binary'")
+        self.framing = framing
+        self.frame_parser = BinaryFrameParser()
+
+        # Part of a line that has been read from the serial port, but has not fully arrived yet
+        self.partial_line = b""
+
+        # Maps the Arduino's clock to this computer's clock, so samples are timed by when they were measured
+        self.device_clock = DeviceClock()
+
+        # Sequence number of the last sample received, and amount of samples that were sent but never received
+        self.last_sequence_number = None
+        self.dropped_samples = 0
+
+        # Samples collected by the data loop, waiting to be received by the dashboard
+        self.sample_channel = SampleChannel()
+
+        # If a share name is given, every sample is also written to a shared memory ring under that name,
+        # so other processes (e.g. loggers) can read the samples without touching the serial port
+        self.shared_ring = None
+        if share_name != None:
+            self.shared_ring = SharedSampleRing.create(share_name)
+
+        # If a record directory is given, every sample is also recorded to disk there, so the event record survives a crash
+        # Samples are written on the recorder's own thread, so a slow disk does not delay reading and checking samples
+        self.recorder = None
+        if record_directory != None:
+            self.recorder = BackgroundRecorder(record_directory)
+
+        # Checks every sample as soon as it is read, so the alarm does not have to wait for the dashboard
+        self.detector = TsunamiDetector()
+
+        # Pressure and wave height of an alarm activation that has not been collected by poll_alarm() yet
+        self.pending_alarm = None
+
+        # Times how long reading and handling samples takes (disabled unless enabled timers are given)
+        self.stage_timers = stage_timers if stage_timers != None else StageTimers()
+
+        # Set once the serial port is connected, so the data loop can wait for it without polling
+        self.ready_event = threading.Event()
     
     def connect_serial(self, port, baud_rate):
         """Attempt to connect to the serial port. If the port can be opened, returns True. If port cannot be opened or any other exception occurs, returns False."""
 
+        # Close any port that is already open, so it is not left locked by an unused handle
+        self.disconnect_serial()
+
         # Attempt to connect to serial
         try:
             # If the serial port cannot be opened, raise SerialException
-            self.serial_COM = serial.Serial(port, baud_rate)
+            # Reads block until data arrives, up to the read timeout
+            self.serial_COM = serial.Serial(port, baud_rate, timeout=self.READ_TIMEOUT)
+            self.partial_line = b""
+            self.frame_parser.reset()
+            self.device_clock.reset()
+            self.last_sequence_number = None
+            self.update_ready()
             return True
         
         except SerialException:
             
             self.serial_COM = None
+            self.update_ready()
             return False
         
+    def disconnect_serial(self):
+        """Closes the serial port, if it is open."""
+
+        serial_COM = self.serial_COM
+        self.serial_COM = None
+        self.update_ready()
+
+        if serial_COM != None:
+            try:
+                serial_COM.close()
+            except Exception:
+                pass
+
     def get_pressure_data(self):
         """
-            Returns the latest pressure data recorded by the sensor connected to the Arduino.
-            If the arduino runs into an error not being able to record the data or no new data has been sent, return None
+            Returns a list of (time, pressure) for every pressure reading sent by the sensor connected to the Arduino since the last call.
+            The time is when the reading was measured, in seconds since the epoch (like time.time()).
+            Waits until data arrives (up to the read timeout). If no new data has been sent or the data could not be read, returns an empty list.
         """
 
-        # Attempt to read the latest line sent by the senseor
+        # Wait for data to arrive, then read everything that is waiting in the serial buffer in one call
+        # SerialException is an OSError, and on POSIX in_waiting raises a plain OSError once the Arduino is unplugged
         try:
-            data = self.serial_COM.readline().decode().strip()
+            data = self.serial_COM.read(max(self.serial_COM.in_waiting, 1))
+        except OSError:
+            # The serial port has been disconnected, so stop reading from it
+            self.disconnect_serial()
+            return []
         except Exception:
             # The data could not be retrieved, so do not return any data
-            return None
+            # Wait before trying again, so a read that keeps failing does not spin the data loop
+            time.sleep(self.READ_TIMEOUT)
+            return []
 
-        # If data exists, process the data and get the pressure reading
-        if data:
-            try:
-                # Attempt to convert data to a floating point number
-                data_float = float(data)
-                return data_float
-            except ValueError:
-                # If the data is unable to be converted, return None
-                return None
+        receive_time = time.time()
+        start = self.stage_timers.start()
+
+        # Get every reading as (sequence number, device time, pressure)
+        if self.framing == "binary":
+            # Binary frames are decoded by the frame parser
+            readings = self.frame_parser.feed(data)
         else:
-            # Data could not be retrieved, so do not return any data
+            # Split data into lines. The last line may not have fully arrived yet, so keep it until the next read
+            lines = (self.partial_line + data).split(b"\n")
+            self.partial_line = lines.pop()
+
+            readings = []
+            for line in lines:
+                reading = self.parse_line(line)
+                if reading != None:
+                    readings.append(reading)
+
+        # Work out when each reading was measured
+        samples = []
+        for sequence_number, device_time, pressure in readings:
+
+            # Older firmware does not send the device time, so use the time the reading was received
+            if device_time == None:
+                sample_time = receive_time
+            else:
+                restarts = self.device_clock.restarts
+                sample_time = self.device_clock.to_host_time(device_time, receive_time)
+
+                # The Arduino's sequence numbers start again from 0 when it restarts, so no samples were dropped
+                if self.device_clock.restarts != restarts:
+                    self.last_sequence_number = None
+
+            self.count_dropped_samples(sequence_number)
+            samples.append((sample_time, pressure))
+
+        self.stage_timers.stop("get_pressure_data", start)
+        return samples
+
+
+    def parse_line(self, line):
+        """
+            Converts a line of text sent by the sensor into (sequence number, device time, pressure).
+            Lines are either "device time,sequence number,pressure", or just the pressure for older firmware (the sequence number and device time are None).
+            If the line is not a pressure reading, returns None.
+        """
+
+        try:
+            values = line.decode().strip().split(",")
+
+            # Attempt to convert data to numbers
+            if len(values) == 3:
+                return int(values[1]), int(values[0]), float(values[2])
+            elif len(values) == 1:
+                return None, None, float(values[0])
+            else:
+                return None
+
+        except (UnicodeDecodeError, ValueError):
+            # If the data is unable to be converted, return None
             return None
-        
+
+
+    def count_dropped_samples(self, sequence_number):
+        """Counts the samples missing between this sample and the last one, using their sequence numbers."""
+
+        if sequence_number == None: return
+
+        # The sequence number wraps around after 65535
+        if self.last_sequence_number != None:
+            self.dropped_samples += (sequence_number - self.last_sequence_number - 1) % 65536
+        self.last_sequence_number = sequence_number
+
 
     def data_loop(self):
         """
-            Tries to collect data. Runs every 20th of a second.
+            Collects data as soon as it arrives from the serial port, until stop() is called.
         """
 
-        # Run a While True loop to constantly retrieve pressure data from the sensor
-        while True:
+        # Run a loop to constantly retrieve pressure data from the sensor
+        while not self.break_loop:
+
+            # Wait until the serial is connected
+            if not self.ready_event.is_set():
+                self.ready_event.wait(self.READ_TIMEOUT)
+                continue
+
+            # Retrieve every pressure reading that has arrived, waking up as soon as data arrives
+            samples = self.get_pressure_data()
+
+            start = self.stage_timers.start()
+            self.handle_samples(samples)
+            self.stage_timers.stop("handle_samples", start)
+
+        self.close_outputs()
+
+
+    def handle_samples(self, samples):
+        """Checks a list of (time, pressure) samples for a tsunami, then passes them on to the dashboard, shared memory and recorder."""
+
+        # Check if any sample breaches the alarm threshold
+        self.check_alarm(samples)
+
+        # Put the samples in the sample channel, where the dashboard collects them once per frame
+        self.sample_channel.push_batch(samples)
+
+        # Share the samples with other processes
+        if self.shared_ring != None and len(samples) > 0:
+            self.shared_ring.append_batch(samples)
+
+        # Record the samples to disk
+        if self.recorder != None and len(samples) > 0:
+            self.recorder.append_batch(samples)
+
+
+    def close_outputs(self):
+        """Stops sharing and recording samples. Called once the data loop has finished."""
+
+        # Stop sharing samples
+        if self.shared_ring != None:
+            self.shared_ring.close()
+            self.shared_ring.unlink()
+            self.shared_ring = None
+
+        # Write any samples that have not been synced to disk yet
+        if self.recorder != None:
+            self.recorder.close()
+            self.recorder = None
+
+
+    def check_alarm(self, samples):
+        """Checks samples with the tsunami detector, and sends the alarm straight away if the threshold is breached."""
+
+        for sample_time, pressure in samples:
+            if self.detector.check(pressure):
+
+                # SEND TSUNAMI ALARM
+                self.send_alarm()
+                self.pending_alarm = (self.detector.pressure_on_alarm_activate, self.detector.wave_height_on_alarm_activate)
+
+
+    def configure_detection(self, calibrated_air_pressure, standing_water_level, alarm_threshold):
+        """Set the calibration and alarm threshold used by the tsunami detector."""
+        self.detector.configure(calibrated_air_pressure, standing_water_level, alarm_threshold)
 
-            time.sleep(0.05)
 
-            # Check if dashboard is connected to this data transmitter
-            if self.dashboard == None: continue
+    def reset_alarm(self):
+        """Allow the tsunami detector to activate the alarm again."""
 
-            # Check if serial is connected
-            if not self.is_serial_connected(): continue
+        self.pending_alarm = None
+        self.detector.reset_alarm()
 
-            # Retrieve pressure from sensor
-            pressure = self.get_pressure_data()
 
-            # If pressure data exists, send it to the dashboard to update the graph
-            if pressure != None:
-                self.dashboard.new_pressure_data(pressure)
+    def poll_alarm(self):
+        """If the alarm has been activated since the last call, returns (pressure, wave height) that activated it. Otherwise returns None."""
+
+        alarm = self.pending_alarm
+        self.pending_alarm = None
+        return alarm
+
+
+    def stop(self):
+        """Stops the data loop."""
+
+        self.break_loop = True
+        self.ready_event.set()
+
+
+    def update_ready(self):
+        """Sets or clears the ready event depending on whether the serial is connected."""
+
+        if self.is_serial_connected():
+            self.ready_event.set()
+        else:
+            self.ready_event.clear()
 
 
 
@@ -100,3 +326,201 @@ class DataTransmitter():
         if self.serial_COM == None: return
         self.serial_COM.write("ALARM".encode())
 
+
+
+class BinaryFrameParser():
+    """
+        Decodes the binary frames sent by tsunamiAlarm_v2.ino when BINARY_FRAMING is on.
+        Each frame is 2 sync bytes, a uint16 sequence number, a uint32 device time in milliseconds, a float32 pressure in hPa
+        and a uint16 CRC-16/CCITT of the 10 bytes before it, all little endian.
+    """
+
+    SYNC = b"\xa5\x5a"
+    CONTENTS = struct.Struct("<HIf")
+    FRAME_LENGTH = 14
+
+    def __init__(self):
+
+        # Data received that has not been decoded yet
+        self.buffer = bytearray()
+
+        # Amount of frames that failed their checksum where a frame was expected (straight after a good frame)
+        self.corrupted_frames = 0
+
+        # Whether the last frame was good, so the next frame should start straight after it
+        self.in_sync = False
+
+    def reset(self):
+        """Forget any partially received frame (e.g. after reconnecting)."""
+
+        self.buffer.clear()
+        self.in_sync = False
+
+    def feed(self, data):
+        """Adds data received from the serial port, and returns a list of (sequence number, device time, pressure) for every complete frame."""
+
+        self.buffer += data
+        frames = []
+        position = 0
+
+        while True:
+
+            # Find the start of the next frame, skipping anything before it (such as text printed on startup)
+            # If anything is skipped, the frames are out of sync until the next good frame
+            next_position = self.buffer.find(self.SYNC, position)
+            if next_position == -1:
+                # Keep the last byte if it could be the first half of the sync bytes
+                next_position = len(self.buffer)
+                if self.buffer.endswith(self.SYNC[:1]):
+                    next_position -= 1
+                if next_position != position:
+                    self.in_sync = False
+                position = next_position
+                break
+
+            if next_position != position:
+                self.in_sync = False
+            position = next_position
+
+            # Wait for the rest of the frame to arrive
+            if len(self.buffer) - position < self.FRAME_LENGTH:
+                break
+
+            contents = bytes(self.buffer[position + 2:position + 12])
+            crc, = struct.unpack_from("<H", self.buffer, position + 12)
+
+            # If the checksum does not match, these were not real sync bytes or the frame is corrupted
+            # It is only counted as corrupted if a frame was expected here - otherwise the parser is still searching for a frame
+            # Search for the next sync bytes from just after these ones
+            if binascii.crc_hqx(contents, 0xFFFF) != crc:
+                if self.in_sync:
+                    self.corrupted_frames += 1
+                self.in_sync = False
+                position += 1
+                continue
+
+            frames.append(self.CONTENTS.unpack(contents))
+            position += self.FRAME_LENGTH
+            self.in_sync = True
+
+        # Remove decoded data from the buffer
+        del self.buffer[:position]
+
+        return frames
+
+
+
+class DeviceClock():
+    """
+        Maps the Arduino's millis() clock to this computer's clock.
+        Samples always arrive some time after they are measured, so the smallest gap between receive time and device time
+        is the closest to the real offset between the clocks. The drift between the clocks is estimated from how that smallest gap changes.
+    """
+
+    # Seconds of device time in each window the smallest offset is taken from when estimating drift
+    DRIFT_WINDOW = 10
+
+    # Amount of windows used to estimate drift
+    DRIFT_WINDOW_COUNT = 30
+
+    # Largest drift allowed for, in seconds per second (100 ppm is well beyond the error of the Arduino's oscillator)
+    MAX_DRIFT = 1e-4
+
+    # Rate the offset is allowed to creep upwards to follow drift the estimate has missed, in seconds per second
+    OFFSET_CREEP = 1e-5
+
+    def __init__(self):
+
+        # Amount of times the Arduino has been seen to restart
+        self.restarts = 0
+
+        self.reset()
+
+    def reset(self):
+        """Forget everything about the device clock (e.g. after the Arduino restarts)."""
+
+        # Last device time in milliseconds as sent by the Arduino, and in seconds counting any wrap arounds
+        self.last_device_millis = None
+        self.device_time = 0.0
+
+        # Estimated host time minus device time, and drift of that offset per second of device time
+        self.offset = None
+        self.drift = 0.0
+
+        # Smallest offset in the current drift window, and in each completed window as (device time, offset)
+        self.window_start = 0.0
+        self.window_minimum = None
+        self.window_minimums = deque(maxlen=self.DRIFT_WINDOW_COUNT)
+
+        # Last host time given out, so times never go backwards
+        self.last_host_time = None
+
+    def to_host_time(self, device_millis, receive_time):
+        """Converts a device time in milliseconds into the host time (seconds since the epoch) the sample was measured at."""
+
+        # Work out how much time has passed on the device. millis() wraps around after 2^32 milliseconds
+        if self.last_device_millis != None:
+            elapsed_millis = (device_millis - self.last_device_millis) % 2**32
+
+            # A large jump means the device time went backwards, so the Arduino has restarted
+            if elapsed_millis >= 2**31:
+                last_host_time = self.last_host_time
+                self.reset()
+                self.last_host_time = last_host_time
+                self.restarts += 1
+                elapsed_millis = 0
+        else:
+            elapsed_millis = 0
+
+        if self.last_device_millis == None:
+            self.device_time = device_millis / 1000
+        else:
+            self.device_time += elapsed_millis / 1000
+        self.last_device_millis = device_millis
+
+        elapsed = elapsed_millis / 1000
+        observed_offset = receive_time - self.device_time
+
+        # Move the offset forward by the estimated drift, and keep the smallest offset seen
+        if self.offset == None:
+            self.offset = observed_offset
+            self.window_start = self.device_time
+        else:
+            self.offset = min(observed_offset, self.offset + (self.drift + self.OFFSET_CREEP) * elapsed)
+
+        self.update_drift(observed_offset)
+
+        # A sample can not have been measured after it was received, or before the last sample
+        host_time = min(self.device_time + self.offset, receive_time)
+        if self.last_host_time != None:
+            host_time = max(host_time, self.last_host_time)
+        self.last_host_time = host_time
+
+        return host_time
+
+    def update_drift(self, observed_offset):
+        """Records the smallest offset in each window and estimates the drift from the line of best fit through them."""
+
+        if self.window_minimum == None or observed_offset < self.window_minimum[1]:
+            self.window_minimum = (self.device_time, observed_offset)
+
+        # Wait for the window to finish
+        if self.device_time - self.window_start < self.DRIFT_WINDOW:
+            return
+
+        self.window_minimums.append(self.window_minimum)
+        self.window_start = self.device_time
+        self.window_minimum = None
+
+        if len(self.window_minimums) < 2:
+            return
+
+        # Calculate slope of the line of best fit through the smallest offsets
+        count = len(self.window_minimums)
+        mean_time = sum(point[0] for point in self.window_minimums) / count
+        mean_offset = sum(point[1] for point in self.window_minimums) / count
+        covariance = sum((point[0] - mean_time) * (point[1] - mean_offset) for point in self.window_minimums)
+        variance = sum((point[0] - mean_time) ** 2 for point in self.window_minimums)
+
+        if variance > 0:
+            self.drift = min(max(covariance / variance, -self.MAX_DRIFT), self.MAX_DRIFT)
@@ -0,0 +1,204 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+# Measures how long the alarm takes to be sent back to the sensor after a pressure spike arrives on the serial port,
+# using the virtual serial device in simulator.py. Only runs on Linux and macOS
+
+#################### IMPORTS ####################
+from arduino_data import DataTransmitter
+from acquisition import AcquisitionProcess
+from simulator import WaveScenario, SerialSimulator
+import numpy as np
+import threading
+import argparse
+import json
+import time
+import os
+
+# Calibration given to the tsunami detector - matches the still water the simulator generates
+AIR_PRESSURE = 1013.25
+DEPTH = 10
+ALARM_THRESHOLD = 5
+
+
+def run_trials(simulator, reset_alarm, trials, spike_length=0.5, settle=0.3, timeout=5):
+    """
+        Injects trials spikes above the alarm threshold, and measures the time from each spike being written to the serial port
+        to the alarm being received back. Yields how many seconds to wait between steps, so it can be driven by a plain loop
+        or by the tkinter event loop. The latencies in seconds are added to the list returned by the StopIteration.
+    """
+
+    latencies = []
+
+    for trial in range(trials):
+
+        # Let the alarm be activated again, and wait for any previous spike to pass
+        reset_alarm()
+        yield settle
+
+        alarms_before = len(simulator.alarm_times)
+        spikes_before = len(simulator.spike_sent_times)
+        simulator.inject_spike(ALARM_THRESHOLD * 3, spike_length)
+
+        # Wait for the alarm
+        wait_start = time.monotonic()
+        while len(simulator.alarm_times) == alarms_before and time.monotonic() - wait_start < timeout:
+            yield 0.001
+
+        if len(simulator.alarm_times) > alarms_before and len(simulator.spike_sent_times) > spikes_before:
+            latencies.append(simulator.alarm_times[alarms_before] - simulator.spike_sent_times[spikes_before])
+        else:
+            print("  Trial {}: alarm not received".format(trial))
+
+        yield spike_length
+
+    return latencies
+
+
+def run_configuration(mode, gui, data_period, history, trials, rate, framing):
+    """Runs the trials with one configuration. Returns the latencies in seconds, or None if the configuration cannot run here."""
+
+    simulator = SerialSimulator(WaveScenario("still", air_pressure=AIR_PRESSURE, depth=DEPTH, noise=0), rate=rate, framing=framing, verbose=False)
+    simulator_thread = threading.Thread(target=simulator.run)
+    simulator_thread.start()
+
+    # Start the data transmitter, in a thread or in the acquisition process
+    data_thread = None
+    if mode == "process":
+        data_transmitter = AcquisitionProcess(framing=framing)
+        data_transmitter.start()
+    else:
+        data_transmitter = DataTransmitter(dashboard=None, framing=framing)
+        data_thread = threading.Thread(target=data_transmitter.data_loop)
+        data_thread.start()
+
+    data_transmitter.connect_serial(simulator.port, 115200)
+    data_transmitter.configure_detection(AIR_PRESSURE, DEPTH, ALARM_THRESHOLD)
+
+    try:
+        if gui:
+            return run_with_dashboard(data_transmitter, simulator, data_period, history, trials)
+
+        # Without the dashboard, nothing collects samples from the sample channel - it fills up and throws new samples away,
+        # which does not affect the alarm
+        steps = run_trials(simulator, data_transmitter.reset_alarm, trials)
+        while True:
+            try:
+                time.sleep(next(steps))
+            except StopIteration as finished:
+                return finished.value
+
+    finally:
+        data_transmitter.stop()
+        if data_thread != None:
+            data_thread.join()
+        simulator.stop()
+        simulator_thread.join()
+        simulator.close()
+
+
+def run_with_dashboard(data_transmitter, simulator, data_period, history, trials):
+    """Runs the trials with the dashboard open. Returns the latencies in seconds, or None if the dashboard cannot be opened."""
+
+    from dashboard import Dashboard
+    from tkinter import TclError, Toplevel
+
+    try:
+        dashboard = Dashboard("Alarm latency benchmark", data_transmitter=data_transmitter)
+    except TclError as error:
+        print("  Skipped - the dashboard could not be opened ({})".format(error))
+        return None
+
+    data_transmitter.set_dashboard(dashboard)
+    dashboard.data_period_var.set(data_period)
+
+    # Fill the dashboard with history at the simulator's rate, ending now
+    dashboard.calibrated_air_pressure = AIR_PRESSURE
+    if history > 0:
+        times = time.time() - np.arange(history, 0, -1) / simulator.rate
+        dashboard.new_pressure_batch(times, np.full(history, AIR_PRESSURE + 1))
+
+    def reset_alarm():
+        # Close the alarm popups opened by the last trial
+        for widget in dashboard.winfo_children():
+            if isinstance(widget, Toplevel):
+                widget.destroy()
+        dashboard.reset_alarm()
+
+    steps = run_trials(simulator, reset_alarm, trials)
+    result = []
+
+    def step():
+        try:
+            dashboard.after(max(int(next(steps) * 1000), 1), step)
+        except StopIteration as finished:
+            result.append(finished.value)
+            dashboard.quit()
+
+    dashboard.after(0, step)
+    dashboard.mainloop()
+    dashboard.render_scheduler.stop()
+    dashboard.destroy()
+
+    return result[0] if result else None
+
+
+def summarise(latencies):
+    """Gets the amount of trials, and the 50th percentile, 99th percentile and maximum latency in milliseconds."""
+
+    latencies = np.array(latencies) * 1000
+    if len(latencies) == 0:
+        return {"trials": 0}
+    return {"trials": len(latencies), "p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max())}
+
+
+
+#################### MAIN ROUTINE ####################
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Measure the time from a pressure spike arriving to the alarm being sent")
+    parser.add_argument("--trials", type=int, default=50, help="spikes to inject per configuration")
+    parser.add_argument("--rate", type=float, default=100, help="samples sent per second by the simulated sensor")
+    parser.add_argument("--framing", choices=["text", "binary"], default="text", help="format the simulated sensor sends data in")
+    parser.add_argument("--modes", nargs="+", choices=["thread", "process"], default=["thread", "process"],
+                        help="run the data transmitter in a thread, or in the acquisition process")
+    parser.add_argument("--gui", nargs="+", choices=["off", "on"], default=["off", "on"], help="run without and/or with the dashboard open")
+    parser.add_argument("--periods", nargs="+", type=int, default=[15, 60], help="data periods to show on the dashboard, in seconds")
+    parser.add_argument("--histories", nargs="+", type=int, default=[0, 65536], help="samples of history to fill the dashboard with first")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to this file as JSON")
+    args = parser.parse_args()
+
+    # The dashboard loads its images relative to this directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    # Data period and history only matter when the dashboard is open
+    configurations = []
+    for mode in args.modes:
+        for gui in args.gui:
+            if gui == "off":
+                configurations.append((mode, False, None, None))
+            else:
+                for data_period in args.periods:
+                    for history in args.histories:
+                        configurations.append((mode, True, data_period, history))
+
+    results = []
+    print("{:<8} {:<4} {:>7} {:>8} {:>7} {:>9} {:>9} {:>9}".format("mode", "gui", "period", "history", "trials", "p50 (ms)", "p99 (ms)", "max (ms)"))
+
+    for mode, gui, data_period, history in configurations:
+
+        latencies = run_configuration(mode, gui, data_period, history, args.trials, args.rate, args.framing)
+        if latencies == None:
+            continue
+
+        summary = summarise(latencies)
+        results.append(dict(mode=mode, gui=gui, data_period=data_period, history=history, **summary))
+
+        print("{:<8} {:<4} {:>7} {:>8} {:>7} {:>9.2f} {:>9.2f} {:>9.2f}".format(mode, "on" if gui else "off", data_period if gui else "-", history if gui else "-",
+                                                                                 summary["trials"], summary.get("p50_ms", float("nan")),
+                                                                                 summary.get("p99_ms", float("nan")), summary.get("max_ms", float("nan"))), flush=True)
+
+    if args.json != None:
+        with open(args.json, "w") as json_file:
+            json.dump({"rate": args.rate, "framing": args.framing, "results": results}, json_file, indent=4)
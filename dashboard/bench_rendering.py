@@ -0,0 +1,212 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+# Measures how long each stage of drawing a frame takes, with histories of different lengths, window sizes and subplot counts.
+# Graphs are drawn offscreen with matplotlib's Agg backend, so no display is needed (except for the dashboard benchmarks)
+
+#################### IMPORTS ####################
+from dashboard import UpdatingGraphFigure
+import matplotlib
+import numpy as np
+import platform
+import argparse
+import json
+import time
+import sys
+import os
+
+# Pressure the synthetic history varies around, in hPa
+BASE_PRESSURE = 1013.25
+
+
+def synthetic_pressures(times):
+    """Generates pressures for the synthetic history - a slow swell with some noise on top."""
+    return BASE_PRESSURE + 0.5 * np.sin(times / 8) + np.random.default_rng(0).normal(0, 0.05, len(times))
+
+
+def summarise(stage_times):
+    """Gets the mean, 50th percentile, 99th percentile and maximum of a list of stage times in seconds, in milliseconds."""
+
+    stage_times = np.array(stage_times) * 1000
+    return {"mean_ms": float(stage_times.mean()), "p50_ms": float(np.percentile(stage_times, 50)),
+            "p99_ms": float(np.percentile(stage_times, 99)), "max_ms": float(stage_times.max())}
+
+
+def time_stage(stage_times, stage, function, *arguments):
+    """Runs a function, adding the time it took to the list of times for its stage."""
+
+    start = time.perf_counter()
+    function(*arguments)
+    stage_times.setdefault(stage, []).append(time.perf_counter() - start)
+
+
+def bench_figure(history, subplots, size, data_period, render_mode, decimation, frames, rate, fps):
+    """Draws frames of an offscreen UpdatingGraphFigure with history samples per subplot. Returns the times of each stage."""
+
+    samples_per_frame = max(int(rate / fps), 1)
+    graph = UpdatingGraphFigure(None, 1, subplots, capacity=history + frames * samples_per_frame, render_mode=render_mode, scroll_step=0.5,
+                                decimation=decimation)
+    graph.fig.set_size_inches(*size)
+
+    # Fill every subplot with the history, ending at time 0
+    times = (np.arange(history) - history) / rate
+    pressures = synthetic_pressures(times)
+    for subplot_num, subplot in enumerate(graph.axes_list):
+        graph.add_data_batch(subplot_num, times, pressures)
+        subplot.set_ylim(BASE_PRESSURE - 1, BASE_PRESSURE + 1)
+
+    # A data period of 0 shows the whole history
+    if data_period == 0:
+        data_period = history / rate
+
+    stage_times = {}
+    now = 0
+    for frame in range(frames):
+
+        # New samples arrive between frames
+        new_times = now + np.arange(1, samples_per_frame + 1) / rate
+        new_pressures = synthetic_pressures(new_times)
+        for subplot_num in range(subplots):
+            graph.add_data_batch(subplot_num, new_times, new_pressures)
+        now = new_times[-1]
+
+        graph.set_center(now)
+        time_stage(stage_times, "update_subplots", graph.update_subplots, data_period)
+        time_stage(stage_times, "draw_canvas", graph.draw_canvas)
+
+    return stage_times
+
+
+def bench_dashboard(history, data_period, frames, rate, fps):
+    """
+        Draws frames of the dashboard with history samples, timing each stage of Dashboard.render_frame.
+        Returns the times of each stage and the amount of history stored, or (None, 0) if the dashboard cannot be opened.
+    """
+
+    from dashboard import Dashboard
+    from arduino_data import DataTransmitter
+    from tkinter import TclError
+
+    # The data transmitter is never connected - samples are given to the dashboard directly
+    data_transmitter = DataTransmitter(dashboard=None)
+    try:
+        dashboard = Dashboard("Rendering benchmark", data_transmitter=data_transmitter)
+    except TclError as error:
+        print("  Skipped - the dashboard could not be opened ({})".format(error))
+        return None, 0
+    dashboard.update()
+
+    # Calibrate, so the water height graph and its lines are drawn too
+    dashboard.calibrated_air_pressure = BASE_PRESSURE - 1
+    dashboard.standing_water_level = 10
+    dashboard.standing_water_air_pressure = BASE_PRESSURE
+    dashboard.alarm_threshold = 5
+    dashboard.data_period_var.set(data_period if data_period > 0 else max(int(history / rate), 1))
+
+    # Fill the dashboard with the history, ending now
+    times = time.time() - np.arange(history, 0, -1) / rate
+    dashboard.new_pressure_batch(times, synthetic_pressures(times))
+    stored = len(dashboard.pressure_data)
+
+    samples_per_frame = max(int(rate / fps), 1)
+    stage_times = {}
+    for frame in range(frames):
+
+        # New samples arrive between frames
+        new_times = time.time() + np.arange(samples_per_frame) / rate
+        dashboard.new_pressure_batch(new_times, synthetic_pressures(new_times))
+        dashboard.graph.set_center(time.time() - dashboard.init_time)
+
+        # The same stages as Dashboard.render_frame
+        time_stage(stage_times, "update_statistics", dashboard.update_statistics)
+        time_stage(stage_times, "update_subplots", dashboard.graph.update_subplots, dashboard.data_period_var.get())
+        time_stage(stage_times, "update_graph_text", dashboard.update_graph_text)
+        time_stage(stage_times, "draw_canvas", dashboard.graph.draw_canvas)
+        dashboard.update()
+
+    dashboard.destroy()
+    return stage_times, stored
+
+
+def make_result(configuration, stage_times):
+    """Combines a configuration with a summary of each of its stages, and of whole frames."""
+
+    frame_times = [sum(times) for times in zip(*stage_times.values())]
+    result = dict(configuration)
+    result["stages"] = {stage: summarise(times) for stage, times in stage_times.items()}
+    result["frame"] = summarise(frame_times)
+    return result
+
+
+
+#################### MAIN ROUTINE ####################
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Measure how long each stage of drawing a frame takes")
+    parser.add_argument("--histories", nargs="+", type=int, default=[1000, 10000, 100000, 1000000, 10000000], help="samples of history per subplot")
+    parser.add_argument("--subplots", nargs="+", type=int, default=[2], help="amounts of subplots to draw")
+    parser.add_argument("--sizes", nargs="+", default=["13x6.8"], help="figure sizes in inches, as WIDTHxHEIGHT")
+    parser.add_argument("--periods", nargs="+", type=float, default=[15, 0], help="data periods to show in seconds (0 shows the whole history)")
+    parser.add_argument("--modes", nargs="+", choices=["blit", "full"], default=["blit"], help="render modes of the graph")
+    parser.add_argument("--decimation", nargs="+", choices=["on", "off"], default=["on"], help="whether lines are decimated to the plot width")
+    parser.add_argument("--frames", type=int, default=60, help="frames to draw per configuration")
+    parser.add_argument("--rate", type=float, default=10, help="samples per second in the synthetic history")
+    parser.add_argument("--fps", type=float, default=30, help="frames per second new samples arrive at")
+    parser.add_argument("--dashboard", action="store_true", help="also benchmark the whole dashboard (needs a display)")
+    parser.add_argument("--output", metavar="FILE", default="bench_rendering.json", help="file to write the results to as JSON")
+    args = parser.parse_args()
+
+    # The dashboard loads its images relative to this directory
+    output = os.path.abspath(args.output)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    report = {"versions": {"python": sys.version.split()[0], "numpy": np.__version__, "matplotlib": matplotlib.__version__,
+                           "platform": platform.platform()},
+              "settings": {"frames": args.frames, "rate": args.rate, "fps": args.fps},
+              "figure": [], "dashboard": []}
+
+    print("{:<10} {:>8} {:>11} {:>7} {:>6} {:>10} {:>16} {:>12} {:>11}".format("history", "subplots", "size", "period", "mode", "decimation",
+                                                                             "update_subplots", "draw_canvas", "frame p99"))
+    for history in args.histories:
+        for subplots in args.subplots:
+            for size in args.sizes:
+                for data_period in args.periods:
+                    for render_mode in args.modes:
+                        for decimation in args.decimation:
+
+                            width, height = (float(value) for value in size.split("x"))
+                            stage_times = bench_figure(history, subplots, (width, height), data_period, render_mode, decimation == "on",
+                                                       args.frames, args.rate, args.fps)
+
+                            result = make_result({"history": history, "subplots": subplots, "size": [width, height], "data_period": data_period,
+                                                  "render_mode": render_mode, "decimation": decimation == "on"}, stage_times)
+                            report["figure"].append(result)
+
+                            print("{:<10} {:>8} {:>11} {:>7g} {:>6} {:>10} {:>13.2f} ms {:>9.2f} ms {:>8.2f} ms".format(
+                                history, subplots, size, data_period, render_mode, decimation, result["stages"]["update_subplots"]["p50_ms"],
+                                result["stages"]["draw_canvas"]["p50_ms"], result["frame"]["p99_ms"]), flush=True)
+
+    if args.dashboard:
+        print()
+        print("{:<10} {:>8} {:>7} {:>18} {:>16} {:>18} {:>12}".format("history", "stored", "period", "update_statistics", "update_subplots", "update_graph_text", "draw_canvas"))
+        dashboard_available = True
+        for history in args.histories:
+            for data_period in args.periods:
+
+                if not dashboard_available: break
+                stage_times, stored = bench_dashboard(history, data_period, args.frames, args.rate, args.fps)
+                if stage_times == None:
+                    dashboard_available = False
+                    break
+
+                # The dashboard only stores as much history as its buffers hold
+                result = make_result({"history": history, "stored": stored, "data_period": data_period}, stage_times)
+                report["dashboard"].append(result)
+
+                print("{:<10} {:>8} {:>7g} {:>15.2f} ms {:>13.2f} ms {:>15.2f} ms {:>9.2f} ms".format(
+                    history, stored, data_period, *(result["stages"][stage]["p50_ms"] for stage in
+                                                    ("update_statistics", "update_subplots", "update_graph_text", "draw_canvas"))), flush=True)
+
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=4)
+    print("Results written to {}".format(output))
@@ -7,16 +7,23 @@ from tkinter import *
 import matplotlib
 import matplotlib.axes
 import matplotlib.figure
-import matplotlib.pyplot
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import time
-import threading
 import numpy as np
+import math
 from datetime import datetime
+from sample_buffer import SampleRingBuffer
+from render_scheduler import RenderScheduler
+from window_stats import SlidingWindowStats
+from stage_timers import StageTimers
+from decimation import decimate_min_max
+from pyramid import TimeSeriesPyramid
+import detector
 
 class Dashboard(Tk):
 
-    def __init__(self, title, data_transmitter):
+    def __init__(self, title, data_transmitter, serial_port="COM5", baud_rate=115200, start_time=None, stage_timers=None):
 
         super().__init__()
 
@@ -27,14 +34,21 @@ class Dashboard(Tk):
         # Data transmitter object that receives and sends data
         self.data_transmitter = data_transmitter
 
+        # Serial port the Arduino is connected to
+        self.serial_port = serial_port
+        self.baud_rate = baud_rate
+
         # Define data variables
         ##########################
         # Data received from the pressure sensor 
-        # (first list is time values in seconds, second list is pressure in hPa)
-        self.pressure_data = [[], []]
+        # (times are in seconds, values are pressure in hPa)
+        self.pressure_data = SampleRingBuffer()
         # Data calculated for the water height above the sensor
-        # (first list is time values in seconds, second list is water height in centimetres)
-        self.water_height_data = [[], []]
+        # (times are in seconds, values are water height in centimetres)
+        self.water_height_data = SampleRingBuffer()
+        # Minimum and maximum pressure at resolutions from 1 second to 10 minutes, for showing spans of history
+        # longer than the data buffers hold (the water height history is converted from it when drawn)
+        self.pressure_history = TimeSeriesPyramid()
 
         # Calibrated air pressure used in water level calculations - if None, that means not calibrated yet
         self.calibrated_air_pressure = None
@@ -51,6 +65,11 @@ class Dashboard(Tk):
         self.data_period_var = IntVar()
         self.data_period_var.set(15)
 
+        # Spans of history the graph can show instead of the data period, in seconds (0 shows the data period)
+        self.history_spans = {"Live": 0, "1 hour": 3600, "6 hours": 6 * 3600, "24 hours": 24 * 3600, "7 days": 7 * 24 * 3600}
+        self.history_span_var = StringVar()
+        self.history_span_var.set("Live")
+
         # Variables to check if alarm has been sent, and if it is on cooldown
         self.alarm_sent = False
         self.alarm_cooldown = False
@@ -64,12 +83,50 @@ class Dashboard(Tk):
         self.water_height_graph_default_ylim = [0, 15]
         self.water_height_graph_ylim_buffer = 2.5
 
+        # Amount of seconds the graphs scroll by at a time - the static parts of the graphs are only redrawn once every step
+        self.graph_scroll_step = 0.5
+
+        # Frame rate the dashboard aims to render at
+        self.target_fps = 30
+
+        # State of the dashboard when the last frame was drawn - if nothing has changed, the next frame is skipped
+        self.last_frame_state = None
+
+        # State of the data window and calibration when statistics were last calculated - if nothing has changed, they are not recalculated
+        self.last_statistics_state = None
+
+        # Text and colors currently shown by each statistic display, so widgets are only reconfigured when the display changes
+        self.stat_display_cache = {}
+
+        # Streaming statistics of the pressure and water height within the data period
+        # The period the statistics were last expired with is kept, so they can be rebuilt if the period grows
+        self.pressure_stats = SlidingWindowStats()
+        self.water_height_stats = SlidingWindowStats()
+        self.statistics_period = self.data_period_var.get()
+
+        # Times each stage of rendering a frame (disabled unless enabled timers are given)
+        self.stage_timers = stage_timers if stage_timers != None else StageTimers()
+
         # Set time of initialisation - used in time calculations
-        self.init_time = time.time()
+        # If the data transmitter was started before the dashboard, start_time is when it started, so samples buffered while the dashboard loaded are kept
+        self.init_time = start_time if start_time != None else time.time()
+
+        # Whether the Arduino was connected when the connection was last checked
+        self.serial_connected = False
 
         # Create all widgets
         self.create_widgets()
 
+        # The serial port may have already been connected before the dashboard was created
+        if self.data_transmitter.is_serial_connected():
+            self.status_var.set("Arduino connected!")
+            self.pressure_calibrate_button.enable()
+            self.update_connection_status()
+
+        # Create scheduler that renders frames on the tkinter event loop
+        self.render_scheduler = RenderScheduler(self, self.render_frame, target_fps=self.target_fps, stats_callback=self.update_render_stats,
+                                                stage_timers=self.stage_timers)
+
 
 
     def create_widgets(self):
@@ -95,6 +152,13 @@ class Dashboard(Tk):
                             background="#41D3BD", foreground="#0E1116", padx=20, pady=0)
         self.date_time_label.grid(row=1,column=1,sticky="WE")
 
+        # Add achieved frame rate and frame time
+        self.render_stats_var = StringVar()
+        self.render_stats_label = Label(self.header_frame, textvariable=self.render_stats_var, anchor=E, justify=RIGHT, font=("Roboto", 10), 
+                            background="#41D3BD", foreground="#0E1116", padx=20, pady=0)
+        self.render_stats_label.grid(row=0,column=2,sticky="E",rowspan=2)
+        self.header_frame.columnconfigure(2, weight=1)
+
         #####################################################################################
         ############################### CREATING GRAPH FIGURE ###############################
         #####################################################################################
@@ -104,9 +168,20 @@ class Dashboard(Tk):
         self.graph_frame.grid(row=2, column=0, rowspan=3, padx=20, pady=20, sticky="WE")
 
         # Create scrolling graphs
-        self.graph = UpdatingGraphFigure(self.graph_frame, 1, 2)
+        self.graph = UpdatingGraphFigure(self.graph_frame, 1, 2, render_mode="blit", scroll_step=self.graph_scroll_step)
         self.graph.canvas.get_tk_widget().pack()
 
+        # Longer spans of pressure history than the graph's buffer holds are drawn from the pressure history
+        self.graph.set_history_source(0, self.pressure_history)
+
+        # Overlay showing how long each stage of rendering takes, toggled with F3 when the stage timers are enabled
+        self.timers_overlay_var = StringVar()
+        self.timers_overlay = Label(self.graph_frame, textvariable=self.timers_overlay_var, anchor=NW, justify=LEFT, font=("Courier", 9),
+                                    background="#0E1116", foreground="#E4FDE1", padx=5, pady=5)
+        self.timers_overlay_visible = False
+        if self.stage_timers.enabled:
+            self.bind("<F3>", self.toggle_timers_overlay)
+
         # Retrieve important subplots
         self.pressure_subplot = self.graph.get_subplot(0)
         self.water_height_subplot = self.graph.get_subplot(1)
@@ -180,6 +255,14 @@ class Dashboard(Tk):
                                                                     color="#FB3640", fontweight="bold", fontsize=12,
                                                                     horizontalalignment="right",verticalalignment="baseline")
 
+        # The text changes every frame, so it is redrawn on top of the cached graph background
+        self.graph.add_animated_artist(self.current_pressure_text)
+        self.graph.add_animated_artist(self.current_water_height_text)
+        self.graph.add_animated_artist(self.alarm_threshold_text)
+
+        # Recapture the graph background now that the subplots have been formatted
+        self.graph.invalidate_background()
+
         #####################################################################################
         ################################ CREATING INPUT FRAME ###############################
         #####################################################################################
@@ -258,6 +341,20 @@ class Dashboard(Tk):
                                         font=("Roboto", 10, "bold"))
         self.data_period_label.grid(row=1, column=0, pady=(3, 0))
 
+        # Add menu for the span of history to display
+        self.history_span_frame = Frame(self.input_frame, background="#0E1116")
+        self.history_span_frame.grid(row=0, column=6, rowspan=2, padx=10)
+
+        self.history_span_menu = OptionMenu(self.history_span_frame, self.history_span_var, *self.history_spans.keys(), command=self.history_span_change)
+        self.history_span_menu.configure(font=("Roboto", 14, "bold"), foreground="#E4FDE1", background="#151921", activebackground="#0E1116",
+                                         activeforeground="#E4FDE1", borderwidth=0, highlightthickness=0, relief=FLAT, width=8)
+        self.history_span_menu["menu"].configure(font=("Roboto", 12), foreground="#E4FDE1", background="#151921")
+        self.history_span_menu.grid(row=0, column=0)
+
+        self.history_span_label = Label(self.history_span_frame, text="History to display", foreground="#E4FDE1", background="#0E1116",
+                                        font=("Roboto", 10, "bold"))
+        self.history_span_label.grid(row=1, column=0, pady=(3, 0))
+
         # Create status label that updates when an event occurs
         self.status_var = StringVar()
         self.status_var.set("Connect to Arduino to start collecting data.")
@@ -395,46 +492,131 @@ class Dashboard(Tk):
         """Connect to serial port specified"""
 
         # Attempt to connect to serial
-        success = self.data_transmitter.connect_serial("COM5", 115200)
+        success = self.data_transmitter.connect_serial(self.serial_port, self.baud_rate)
         if success:
             self.status_var.set("Arduino connected!")
             self.pressure_calibrate_button.enable()
         else:
             self.status_var.set("Failed to connect to Arduino")
 
+        self.update_connection_status()
+
+
+    def update_connection_status(self):
+        """Only lets the connect button be pressed while the Arduino is not connected, and shows when the Arduino disconnects."""
+
+        connected = self.data_transmitter.is_serial_connected()
+        if connected == self.serial_connected: return
+        self.serial_connected = connected
+
+        if connected:
+            self.connect_button.disable()
+        else:
+            self.connect_button.enable()
+            self.status_var.set("Arduino disconnected - press Connect to Arduino to try again.")
+
+
+    def mainloop(self, n=0):
+        """Starts rendering frames at the target frame rate, then runs the tkinter event loop."""
+
+        self.render_scheduler.start()
+        super().mainloop(n)
+
+
+    def render_frame(self):
+        """
+            Renders a frame of the dashboard. Called by the render scheduler.
+            Returns True if the frame was drawn, or False if nothing has changed since the last frame.
+        """
+
+        timers = self.stage_timers
+
+        # Collect samples sent by the data transmitter since the last frame
+        start = timers.start()
+        self.receive_samples()
+        timers.stop("receive_samples", start)
+
+        # Let the Arduino be connected again if it has been disconnected
+        self.update_connection_status()
+
+        # Check if the data transmitter has activated the alarm
+        alarm = self.data_transmitter.poll_alarm()
+        if alarm != None:
+            self.pressure_on_alarm_activate, self.wave_height_on_alarm_activate = alarm
+            self.alarm_sent = True
+
+        # Check if message needs to be sent
+        if self.alarm_cooldown == False and self.alarm_sent == True:
+
+            self.alarm_cooldown = True
+
+            self.window_activate_alarm()
+
+        # Update date and time on top
+        self.update_date_time()
+
+        time_since_init = time.time() - self.init_time
+        self.graph.set_center(time_since_init)
 
-    def mainloop(self):
+        # Update statistics - only recalculated if samples have entered or left the data window
+        # Done before drawing so changes to the graph limits show up in this frame
+        start = timers.start()
+        self.update_statistics()
+        timers.stop("update_statistics", start)
 
-        while True:
+        # Skip the frame if there are no new samples, the graph limits have not moved and nothing has been recalibrated
+        frame_state = (self.graph.get_render_state(self.get_graph_period()), self.last_statistics_state)
+        if frame_state == self.last_frame_state:
+            return False
+        self.last_frame_state = frame_state
 
-            time_since_init = time.time() - self.init_time
+        start = timers.start()
+        self.graph.update_subplots(self.get_graph_period())
+        timers.stop("update_subplots", start)
 
-            self.graph.set_center(time_since_init)
-            self.graph.update_subplots(self.data_period_var.get())      
+        # Update graph text
+        start = timers.start()
+        self.update_graph_text()
+        timers.stop("update_graph_text", start)
 
-            # Update graph text
-            self.update_graph_text()
+        # Draw canvas
+        start = timers.start()
+        self.graph.draw_canvas()
+        timers.stop("draw_canvas", start)
 
-            # Draw canvas
-            self.graph.draw_canvas()
+        return True
 
-            # Update statistics
-            self.update_statistics()
 
-            # Check if message needs to be sent
-            if self.alarm_cooldown == False and self.alarm_sent == True:
+    def update_render_stats(self, achieved_fps, frame_time):
+        """Update the frame rate display. Called once a second by the render scheduler."""
 
-                self.alarm_cooldown = True
+        render_stats = "{:.1f} FPS ({:.1f} ms/frame)".format(achieved_fps, frame_time)
 
-                self.window_activate_alarm()
+        # Show samples that were sent by the Arduino but never received, as they will show up as gaps on the graphs
+        if self.data_transmitter.dropped_samples > 0:
+            render_stats += "\n{} samples dropped".format(self.data_transmitter.dropped_samples)
 
-            # Update date and time on top
-            self.update_date_time()
+        # Show samples that were received but thrown away because the dashboard fell behind and the sample channel was full
+        overflowed_samples = self.data_transmitter.sample_channel.overflowed_samples
+        if overflowed_samples > 0:
+            render_stats += "\n{} samples not shown (dashboard fell behind)".format(overflowed_samples)
 
-            # Update window widgets
-            self.update()
-            self.update_idletasks()
+        self.render_stats_var.set(render_stats)
 
+        # Refresh the stage timers overlay
+        if self.timers_overlay_visible:
+            self.timers_overlay_var.set(self.stage_timers.format_summary())
+
+
+    def toggle_timers_overlay(self, event=None):
+        """Shows or hides the overlay of how long each stage of rendering takes."""
+
+        self.timers_overlay_visible = not self.timers_overlay_visible
+        if self.timers_overlay_visible:
+            self.timers_overlay_var.set(self.stage_timers.format_summary())
+            self.timers_overlay.place(x=0, y=0)
+        else:
+            self.timers_overlay.place_forget()
 
 
     def window_activate_alarm(self):
@@ -470,6 +652,7 @@ class Dashboard(Tk):
         self.change_alarm_status("ready")
 
         # Reset alarm sending variables
+        self.data_transmitter.reset_alarm()
         self.alarm_sent = False
         self.alarm_cooldown = False
         self.pressure_on_alarm_activate = None
@@ -550,50 +733,43 @@ class Dashboard(Tk):
 
 
         
-    def new_pressure_data(self, pressure):
-        """
-            Send pressure data from the data transmitter to the dashboard. 
-            Usually ran in a seperate thread
-        """
+    def receive_samples(self):
+        """Collects every sample waiting in the data transmitter's sample channel. Runs on the main thread once per frame."""
 
-        # Get the time since initialisation, and use that as x coordinate on graph
-        time_since_init = time.time() - self.init_time
-        self.pressure_data[0].append(time_since_init)
-
-        # Use pressure as y coordinate on graph
-        self.pressure_data[1].append(pressure)
-
-        # Add data point to pressure graph
-        self.graph.add_data_point(0, time_since_init, pressure)
+        sample_times, pressures = self.data_transmitter.sample_channel.drain()
+        self.new_pressure_batch(sample_times, pressures)
 
-        # Calculate water height from pressure
-        if self.calibrated_air_pressure != None:
-            water_height = self.calculate_water_height(pressure)
-            self.graph.add_data_point(1, time_since_init, water_height)
 
-            if self.standing_water_level != None and self.alarm_threshold != None:
+    def new_pressure_batch(self, sample_times, pressures):
+        """
+            Send a batch of pressure data that arrived together from the data transmitter to the dashboard.
+            sample_times and pressures are NumPy arrays, with times in seconds since the epoch.
+        """
 
-                # Check if water height has broken threshold
-                wave_height =  water_height - self.standing_water_level
-                if wave_height > self.alarm_threshold and self.alarm_sent == False:
+        if len(sample_times) == 0:
+            return
 
-                    # Save the pressure wave height on alarm activation
-                    self.pressure_on_alarm_activate = pressure
-                    self.wave_height_on_alarm_activate = wave_height
+        start = self.stage_timers.start()
 
-                    self.alarm_sent = True
+        # Get the time since initialisation of every sample, and use that as x coordinate on graph
+        times_since_init = sample_times - self.init_time
 
-                    # SEND TSUNAMI ALARM IN DIFFERENT THREAD
-                    send_alarm_thread = threading.Thread(target=self.send_alarm)
-                    send_alarm_thread.start()
+        # Store pressures against the time they were measured, and add them to the pressure graph and statistics
+        self.pressure_data.append_batch(times_since_init, pressures)
+        self.graph.add_data_batch(0, times_since_init, pressures)
+        self.pressure_stats.add_batch(times_since_init, pressures)
+        self.pressure_history.add_batch(times_since_init, pressures)
 
+        # Calculate the water heights of the whole batch at once
+        if self.calibrated_air_pressure != None:
+            water_heights = self.calculate_water_heights(pressures)
+            self.water_height_data.append_batch(times_since_init, water_heights)
+            self.graph.add_data_batch(1, times_since_init, water_heights)
+            self.water_height_stats.add_batch(times_since_init, water_heights)
 
-    def send_alarm(self):
-        """Start the alarm. Ran when the wave height threshold is breached."""
+        self.stage_timers.stop("new_pressure_batch", start)
 
-        self.data_transmitter.send_alarm()            
 
-    
     def data_period_change(self, period):
         """Called when the data period slider is changed"""
 
@@ -605,52 +781,111 @@ class Dashboard(Tk):
         self.period_data_label.configure(text="Last {:.2f} seconds".format(self.data_period_var.get()))
 
 
-    def calculate_water_height(self, pressure):
-        """Calculate water height in centimetres using formula P = P0 + pgh"""
+    def history_span_change(self, span_name):
+        """Called when a span of history is chosen from the history menu"""
 
-        # Set constants
-        WATER_DENSITY = 997 # p - Density of water (kgm^-3)
-        GRAVITY_FORCE = 9.81 # g - Weight of gravity (ms^-2)
+        # Scroll in bigger steps when showing a longer span, so the whole graph is not redrawn many times for each pixel it moves
+        self.graph.scroll_step = max(self.graph_scroll_step, self.get_graph_period() / 1000)
 
-        # Calculate water height (h) in metres using formula P = P0 + pgh
-        water_height = ((pressure - self.calibrated_air_pressure) * 100) / (WATER_DENSITY * GRAVITY_FORCE)
 
-        if water_height < 0:
-            return 0
+    def get_graph_period(self):
+        """Gets the amount of seconds the graph shows - the chosen span of history, or the data period if that is longer."""
+        return max(self.data_period_var.get(), self.history_spans[self.history_span_var.get()])
 
-        # Convert water height into centimetres and return value
-        return (water_height * 100)
+
+    def get_shown_extremes(self, subplot_num, minimum, maximum):
+        """
+            Widens the minimum and maximum of the data period's statistics to include the rest of the history drawn on a subplot,
+            if the graph shows a span of history longer than the data period. Returns (None, None) if nothing is drawn.
+        """
+
+        graph_period = self.get_graph_period()
+        if graph_period <= self.data_period_var.get(): return minimum, maximum
+
+        history_minimum, history_maximum = self.graph.get_history_extremes(subplot_num, graph_period)
+        if history_maximum == None: return minimum, maximum
+        if maximum == None: return history_minimum, history_maximum
+        return min(minimum, history_minimum), max(maximum, history_maximum)
+
+
+    def recompute_water_heights(self):
+        """
+            Recalculates the whole water height history from the stored pressure history, using the current calibrated air pressure.
+            Called after the air pressure is calibrated, so the water height graph and statistics show a consistent history straight away.
+        """
+
+        if self.calibrated_air_pressure == None:
+            return
+
+        # Convert every stored pressure at once
+        times = self.pressure_data.get_times()
+        water_heights = self.calculate_water_heights(self.pressure_data.get_values())
+
+        # Replace the water height history and the water height graph's data
+        self.water_height_data.clear()
+        self.water_height_data.append_batch(times, water_heights)
+        self.graph.set_data(1, times, water_heights)
+
+        # Rebuild the water height statistics from the new history
+        min_x = time.time() - self.init_time - self.statistics_period
+        self.water_height_stats.rebuild(*self.graph.get_data_within_last_x(1, min_x))
+        self.last_statistics_state = None
+
+
+    def calculate_water_heights(self, pressures):
+        """Calculate the water height in centimetres of every pressure in an array, using formula P = P0 + pgh"""
+        return detector.calculate_water_heights(pressures, self.calibrated_air_pressure)
+
+
+    def update_detection(self):
+        """Sends the current calibration and alarm threshold to the data transmitter's tsunami detector."""
+        self.data_transmitter.configure_detection(self.calibrated_air_pressure, self.standing_water_level, self.alarm_threshold)
     
 
 
     def update_statistics(self):
         """Updates statistics, showing the statistics in the last self.data_period seconds."""
 
-        # Get data points
         time_since_init = time.time() - self.init_time
-        pressure_xs, pressure_ys = self.graph.get_data_within_last_x(0, time_since_init - self.data_period_var.get())
-        water_height_xs, water_height_ys = self.graph.get_data_within_last_x(1, time_since_init - self.data_period_var.get())
+        data_period = self.data_period_var.get()
+        min_x = time_since_init - data_period
+
+        # If the data period has grown, samples that have already been expired are back in the window, so rebuild the statistics
+        if data_period > self.statistics_period:
+            self.pressure_stats.rebuild(*self.graph.get_data_within_last_x(0, min_x))
+            self.water_height_stats.rebuild(*self.graph.get_data_within_last_x(1, min_x))
+        self.statistics_period = data_period
+
+        # Only recalculate if a sample has entered or left the window, or a calibration has changed
+        statistics_state = (self.graph.get_window_state(0, min_x), self.graph.get_window_state(1, min_x), self.calibrated_air_pressure, 
+                            self.standing_water_air_pressure, self.standing_water_level, self.alarm_threshold, self.history_span_var.get())
+        if statistics_state == self.last_statistics_state:
+            return
+        self.last_statistics_state = statistics_state
+
+        # Remove samples that have left the window
+        self.pressure_stats.expire(min_x)
+        self.water_height_stats.expire(min_x)
 
         # Calculate maximum pressure
-        max_pressure = None
-        min_pressure = None
-        if len(pressure_ys) > 0:
+        max_pressure = self.pressure_stats.get_max()
+        min_pressure = self.pressure_stats.get_min()
 
-            # Calculate max pressure and light up statistic's color
-            max_pressure = max(pressure_ys)
-            min_pressure = min(pressure_ys)
+        # The graph may also show history from before the data period
+        min_pressure_shown, max_pressure_shown = self.get_shown_extremes(0, min_pressure, max_pressure)
+        if max_pressure_shown != None:
 
             # Change the maximum and minimum y limits of the pressure graph, so it displays all data correctly
             # without going out of bounds
             ylim_min = self.pressure_graph_default_ylim[0]
             ylim_max = self.pressure_graph_default_ylim[1]
-            if min_pressure - self.pressure_graph_ylim_buffer < ylim_min:
-                ylim_min = min_pressure - self.pressure_graph_ylim_buffer
+            if min_pressure_shown - self.pressure_graph_ylim_buffer < ylim_min:
+                ylim_min = min_pressure_shown - self.pressure_graph_ylim_buffer
             
-            if max_pressure + self.pressure_graph_ylim_buffer > ylim_max:
-                ylim_max = max_pressure + self.pressure_graph_ylim_buffer
+            if max_pressure_shown + self.pressure_graph_ylim_buffer > ylim_max:
+                ylim_max = max_pressure_shown + self.pressure_graph_ylim_buffer
 
-            self.pressure_subplot.set_ylim(ylim_min, ylim_max)
+            self.update_ylim(self.pressure_subplot, ylim_min, ylim_max)
 
 
         # Change display of maximum pressure
@@ -670,22 +905,19 @@ class Dashboard(Tk):
         max_wave_height = None
         current_wave_height = None
 
-        max_water_height = None
-        min_water_height = None
+        max_water_height = self.water_height_stats.get_max()
+        min_water_height = self.water_height_stats.get_min()
 
         max_wave_height_color = "#E4FDE1"
         current_wave_height_color = "#E4FDE1"
 
-        if len(water_height_ys) > 0:
-
-            min_water_height = min(water_height_ys)
-            max_water_height = max(water_height_ys)
+        if max_water_height != None:
 
             if self.standing_water_level != None:
 
                 # Get max wave height and current wave height
                 max_wave_height = max_water_height - self.standing_water_level
-                current_wave_height = water_height_ys[0] - self.standing_water_level
+                current_wave_height = self.water_height_stats.get_latest() - self.standing_water_level
                 
                 # Set lower boundary to 0
                 if max_wave_height < 0: max_wave_height = 0
@@ -696,14 +928,18 @@ class Dashboard(Tk):
                     max_wave_height_color = self.get_number_color(max_wave_height, self.alarm_threshold)
                     current_wave_height_color = self.get_number_color(current_wave_height, self.alarm_threshold)
 
+        # The graph may also show history from before the data period
+        max_water_height_shown = self.get_shown_extremes(1, min_water_height, max_water_height)[1]
+        if max_water_height_shown != None:
+
             # Change the maximum y limit of the water height graph, so it displays all data correctly
             # without going out of bounds (the minimum will always be)
             ylim_min = self.water_height_graph_default_ylim[0]
             ylim_max = self.water_height_graph_default_ylim[1]
-            if max_water_height + self.water_height_graph_ylim_buffer > ylim_max:
-                ylim_max = max_water_height + self.water_height_graph_ylim_buffer
+            if max_water_height_shown + self.water_height_graph_ylim_buffer > ylim_max:
+                ylim_max = max_water_height_shown + self.water_height_graph_ylim_buffer
 
-            self.water_height_subplot.set_ylim(ylim_min, ylim_max)
+            self.update_ylim(self.water_height_subplot, ylim_min, ylim_max)
 
         # Change display if air pressure has been calibrated
         self.change_stat_display(max_wave_height, self.max_wave_height_var, self.max_wave_height_number, self.max_wave_height_label,
@@ -753,27 +989,39 @@ class Dashboard(Tk):
         # Format date and time as string
         dt_string = now.strftime("%d/%m/%Y %H:%M:%S")
         
-        # Set variable to string
-        self.date_time_stringvar.set(dt_string)
+        # Set variable to string, only if the time shown has changed
+        if dt_string != self.date_time_stringvar.get():
+            self.date_time_stringvar.set(dt_string)
 
         
 
         
 
         
-    def change_stat_display(self, stat, var, number_widget, label_widget, number_color, label_color):
+    def update_ylim(self, subplot, bottom, top):
+        """Sets the vertical limits of a subplot, only if they have changed (changing the limits redraws the whole graph)."""
 
-        if stat != None:
+        if tuple(subplot.get_ylim()) != (bottom, top):
+            subplot.set_ylim(bottom, top)
 
-            var.set("{:.2f}".format(stat))
-            number_widget.configure(foreground=number_color)
-            label_widget.configure(foreground=label_color)
 
+    def change_stat_display(self, stat, var, number_widget, label_widget, number_color, label_color):
+        """Shows a statistic on its display. Widgets are only updated if the shown text or colors have changed."""
+
+        if stat != None:
+            display = ("{:.2f}".format(stat), number_color, label_color)
         else:
+            display = ("N/A", "#202733", "#202733")
 
-            var.set("N/A")
-            number_widget.configure(foreground="#202733")
-            label_widget.configure(foreground="#202733")
+        # Check if the display is already showing this
+        if self.stat_display_cache.get(str(var)) == display:
+            return
+        self.stat_display_cache[str(var)] = display
+
+        text, number_color, label_color = display
+        var.set(text)
+        number_widget.configure(foreground=number_color)
+        label_widget.configure(foreground=label_color)
 
     
 
@@ -794,30 +1042,27 @@ class Dashboard(Tk):
         """Calibrates the environment's average air pressure in the last length seconds"""
 
         time_since_init = time.time() - self.init_time
-        pressure_data_points = []
-
-        index = 1
-        while True:
 
-            # Find data point on pressure graph
-            time_recorded, pressure_recorded = self.graph.get_data_point(0, -index)
-            if time_recorded == None or pressure_recorded == None: break
-
-            if time_since_init - time_recorded <= length:
-                pressure_data_points.append(pressure_recorded)
-            else:
-                break
-            index += 1
+        # Find data points on pressure graph in the last length seconds
+        x_points, pressure_data_points = self.graph.get_data_within_last_x(0, time_since_init - length)
 
-        # Calculate mean air pressure in the last length seconds
-        try:
-            self.calibrated_air_pressure = sum(pressure_data_points) / len(pressure_data_points)
-        except ZeroDivisionError:
-            # No data points were collected
+        # Check that data points were collected
+        if len(pressure_data_points) == 0:
             print("Could not calibrate air pressure, lack of data")
             self.status_var.set("Could not calibrate air pressure, lack of data")
             return
 
+        # Calculate mean air pressure in the last length seconds
+        self.calibrated_air_pressure = float(pressure_data_points.mean())
+
+        # Water heights before now were calculated against the old calibration (or not at all), so recalculate them
+        self.recompute_water_heights()
+
+        # Longer spans of water height history are converted from the pressure history with the calibration when drawn
+        self.graph.set_history_source(1, self.pressure_history, self.calculate_water_heights)
+
+        self.update_detection()
+
         # Enable pressure calibrate button again
         self.pressure_calibrate_button.enable()
         self.set_standing_depth_button.enable()
@@ -848,7 +1093,9 @@ class Dashboard(Tk):
         
         # Set alarm threshold
         self.alarm_threshold = alarm_threshold
+        self.update_detection()
         self.alarm_threshold_line.set_ydata([alarm_threshold + self.standing_water_level, alarm_threshold + self.standing_water_level])
+        self.graph.invalidate_background()
         self.alarm_threshold_var.set("{:.2f}".format(alarm_threshold))
         self.status_var.set("Alarm threshold set to {:.2f}".format(alarm_threshold))
 
@@ -873,24 +1120,26 @@ class Dashboard(Tk):
         """Calibrates the standing water height once the sensor is in the bottom of the water"""
 
         time_since_init = time.time() - self.init_time
-        water_height_data_points = []
 
         x_points, pressure_data_points = self.graph.get_data_within_last_x(0, time_since_init - length)
         x_points, water_height_data_points = self.graph.get_data_within_last_x(1, time_since_init - length)
 
-        # Calculate mean air pressure in the last length seconds
-        try:
-            self.standing_water_level = sum(water_height_data_points) / len(water_height_data_points)
-            self.standing_water_air_pressure = sum(pressure_data_points) / len(pressure_data_points)
-        except ZeroDivisionError:
-            # No data points were collected
+        # Check that data points were collected
+        if len(water_height_data_points) == 0 or len(pressure_data_points) == 0:
             print("Could not calibrate standing water height, lack of data")
             self.status_var.set("Could not calibrate standing water height, lack of data")
             return
 
+        # Calculate mean water height and pressure in the last length seconds
+        self.standing_water_level = float(water_height_data_points.mean())
+        self.standing_water_air_pressure = float(pressure_data_points.mean())
+
+        self.update_detection()
+
         # Enable water height calibrate button again
         self.set_standing_depth_button.enable()
         self.standing_water_height_line.set_ydata([self.standing_water_level, self.standing_water_level])
+        self.graph.invalidate_background()
 
         self.status_var.set("Standing water height calibrated to be {:.2f} cm".format(self.standing_water_level))
         print("Standing water height calibrated to be {:.2f} cm".format(self.standing_water_level))
@@ -966,9 +1215,17 @@ class Dashboard(Tk):
 
 class UpdatingGraphFigure():
 
-    """An updating line graph that scrolls on the x axis displayed using matplotlib."""
+    """
+        An updating line graph that scrolls on the x axis displayed using matplotlib.
+
+        render_mode can be "full", which redraws the whole figure every frame, or "blit", which caches the static parts
+        of the figure (axes, grids, titles, horizontal lines) and only redraws the data lines and any added animated artists.
+        scroll_step snaps the scrolling x axis to steps of that many seconds, so the cached background can be reused between steps.
+        If decimation is True, lines with more points than the plot is wide in pixels are reduced to the minimum and maximum of each pixel column.
+        A subplot can be given a history source (a TimeSeriesPyramid) to draw from when it shows further back than its data buffer holds.
+    """
 
-    def __init__(self, root, graphs_x, graphs_y):
+    def __init__(self, root, graphs_x, graphs_y, capacity=SampleRingBuffer.DEFAULT_CAPACITY, render_mode="full", scroll_step=None, decimation=True):
         
         # Define list of graph axes
         self.axes_list = []
@@ -976,21 +1233,39 @@ class UpdatingGraphFigure():
         # Define list of graph line artists
         self.axes_lines = []
 
-        # Define datapoints of each graph -- this will be a nested list
-        self.x_points = []
-        self.y_points = []
+        # Define datapoints of each graph -- one ring buffer for each subplot, 
+        # holding at most capacity points so memory use stays flat
+        self.capacity = capacity
+        self.data_buffers = []
+
+        # History source of each subplot (a pyramid and a function converting its values, or None)
+        self.history_sources = []
 
         # Define graph size
         self.x_center = 0
         self.y_boundary = [0, 5]
 
-        # Define root tkinter parent
+        # Define root tkinter parent (None to draw offscreen)
         self.root = root
 
         self.hlines = []
         self.text = []
         self.scrolling_text = []
 
+        # Rendering options
+        if render_mode not in ("full", "blit"):
+            raise ValueError("Render mode must be 'full' or 'blit'")
+        self.render_mode = render_mode
+        self.scroll_step = scroll_step
+        self.decimation = decimation
+
+        # Artists redrawn every frame in blit mode, on top of the cached background
+        self.animated_artists = []
+
+        # Cached background of the figure, and the subplot limits it was drawn with
+        self.background = None
+        self.background_limits = None
+
         # Create graphs
         self.create_subplots(graphs_x, graphs_y)
 
@@ -998,13 +1273,15 @@ class UpdatingGraphFigure():
         """Create the desired amount of graphs and put them onto the window"""
         
         # Add amount of desired subplots with data
-        self.fig, axes_array = matplotlib.pyplot.subplots(graphs_y, graphs_x)
+        # The figure is created directly instead of through pyplot, which is slow to import and not needed when embedding in tkinter
+        self.fig = matplotlib.figure.Figure()
+        axes_array = self.fig.subplots(graphs_y, graphs_x)
 
         # Matplotlib returns a singular Axes, not an a
         if isinstance(axes_array, matplotlib.axes.Axes):
-            self.axes_list.append(self.axes)
+            self.axes_list.append(axes_array)
         else:
-            self.axes_list = list(axes_array)
+            self.axes_list = list(axes_array.flat)
 
         # Set display values of graph frame
         self.fig.set_size_inches(13, 6.8)
@@ -1013,9 +1290,9 @@ class UpdatingGraphFigure():
         # Setup subplots
         for subplot in self.axes_list:
 
-            # Create empty datapoints list for each subplot 
-            self.x_points.append([])
-            self.y_points.append([])
+            # Create empty datapoints buffer for each subplot 
+            self.data_buffers.append(SampleRingBuffer(self.capacity))
+            self.history_sources.append(None)
 
             # Create dictionary for each subplot's horizontal lines
             self.hlines.append({})
@@ -1023,37 +1300,154 @@ class UpdatingGraphFigure():
             # Capture the graph line artist for each subplot
             line = subplot.plot([], [])[0]
             self.axes_lines.append(line)
+            self.add_animated_artist(line)
 
         # Create the tkinter canvas containing the graph
-        self.canvas = FigureCanvasTkAgg(self.fig, master = self.root)
+        # If there is no root window, the graph is drawn offscreen instead (e.g. for benchmarks)
+        if self.root == None:
+            self.canvas = FigureCanvasAgg(self.fig)
+        else:
+            self.canvas = FigureCanvasTkAgg(self.fig, master = self.root)
+
+        # Recapture the background every time the whole figure is drawn (e.g. when the window is resized)
+        self.canvas.mpl_connect("draw_event", self.on_draw)
         self.canvas.draw()
 
     def update_subplots(self, data_period):
         """Update the subplots with new data. new_period is the amount of data to show."""
 
-        # Set plot limits
-        # Set the plot limits of the x axis so that the current time on the graph is 2/3rds to the right
-        x_lim_left = self.x_center - data_period
-        x_lim_right = self.x_center + data_period / 2
+        x_lim_left, x_lim_right = self.get_x_limits(data_period)
 
         # Update all subplots
         for i, subplot in enumerate(self.axes_list):
 
             # Get information of subplot
             subplot_line = self.axes_lines[i]
-            x_data = self.x_points[i]
-            y_data = self.y_points[i]
+
+            # If the data buffer does not reach back to the left edge, draw the history instead, at one bucket per pixel column
+            if self.uses_history(i, x_lim_left):
+                x_data, y_data = self.get_history(i, x_lim_left, x_lim_right)
+
+            else:
+                # Only give the line the points that can be seen, keeping one point before the left edge
+                # so the line still reaches the edge of the graph
+                data_buffer = self.data_buffers[i]
+                first_index = max(data_buffer.index_of_time(x_lim_left) - 1, 0)
+                x_data = data_buffer.get_times()[first_index:]
+                y_data = data_buffer.get_values()[first_index:]
+
+                # Reduce the line to the minimum and maximum of each pixel column, so drawing it does not slow down with more points
+                if self.decimation:
+                    x_data, y_data = decimate_min_max(x_data, y_data, x_lim_left, x_lim_right, int(subplot.bbox.width))
 
             # Set data points of the subplot line
-            subplot_line.set_xdata(self.x_points[i])
-            subplot_line.set_ydata(self.y_points[i])
+            subplot_line.set_xdata(x_data)
+            subplot_line.set_ydata(y_data)
 
             # Set limits of subplot
             subplot.set_xlim(left=x_lim_left, right=x_lim_right)
 
+    def get_x_limits(self, data_period):
+        """Gets the left and right x limits the graph is drawn with, so that the current time on the graph is 2/3rds to the right."""
+
+        x_center = self.get_view_center()
+        return x_center - data_period, x_center + data_period / 2
+
+    def set_history_source(self, subplot_num, pyramid, transform=None):
+        """
+            Sets the TimeSeriesPyramid a subplot is drawn from when it shows further back than its data buffer holds.
+            If transform is given, it is called with arrays of the pyramid's values to convert them to the subplot's values.
+            The transform must never decrease as its input increases, so minimums and maximums stay minimums and maximums.
+        """
+
+        self.history_sources[subplot_num] = (pyramid, transform)
+
+    def uses_history(self, subplot_num, x_lim_left):
+        """
+            Returns True if a subplot is drawn from its history source, because its data buffer has overwritten samples
+            that would be shown after x_lim_left. Until the buffer is full, it holds every sample the history source does.
+        """
+
+        if self.history_sources[subplot_num] == None:
+            return False
+
+        data_buffer = self.data_buffers[subplot_num]
+        return len(data_buffer) == data_buffer.capacity and data_buffer.get_times()[0] > x_lim_left
+
+    def get_history(self, subplot_num, x_lim_left, x_lim_right):
+        """Gets the times and values of a subplot's history between the x limits, with about 2 points per pixel column."""
+
+        pyramid, transform = self.history_sources[subplot_num]
+        x_data, y_data = pyramid.get_envelope(x_lim_left, x_lim_right, int(self.axes_list[subplot_num].bbox.width))
+
+        if transform != None:
+            y_data = transform(y_data)
+        return x_data, y_data
+
+    def get_history_extremes(self, subplot_num, data_period):
+        """Gets the (minimum, maximum) of a subplot's history source within the x limits, or (None, None) if there is none."""
+
+        if self.history_sources[subplot_num] == None:
+            return None, None
+
+        x_lim_left, x_lim_right = self.get_x_limits(data_period)
+
+        pyramid, transform = self.history_sources[subplot_num]
+        minimum, maximum = pyramid.get_extremes(x_lim_left, x_lim_right, int(self.axes_list[subplot_num].bbox.width))
+
+        if minimum == None or transform == None:
+            return minimum, maximum
+        minimum, maximum = transform(np.array([minimum, maximum]))
+        return float(minimum), float(maximum)
+
     def draw_canvas(self):
         """ Draw the canvas of the subplots figure"""
-        self.canvas.draw()
+
+        if self.render_mode == "full":
+            self.canvas.draw()
+            return
+
+        # Redraw the whole figure if there is no background yet, or the limits of any subplot have changed
+        if self.background == None or self.background_limits != self.get_limits():
+            self.canvas.draw()
+            return
+
+        # Otherwise, restore the cached background and only draw the animated artists on top
+        self.canvas.restore_region(self.background)
+        self.draw_animated_artists()
+        self.canvas.blit(self.fig.bbox)
+
+    def on_draw(self, event):
+        """Runs after the whole figure is drawn. Caches the background for blitting, then draws the animated artists over it."""
+
+        if self.render_mode != "blit": return
+
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.background_limits = self.get_limits()
+        self.draw_animated_artists()
+
+    def draw_animated_artists(self):
+        """Draws every animated artist onto the canvas."""
+
+        for artist in self.animated_artists:
+            self.fig.draw_artist(artist)
+
+    def add_animated_artist(self, artist):
+        """Adds an artist that changes every frame (e.g. live text). In blit mode it is left out of the cached background and redrawn every frame."""
+
+        self.animated_artists.append(artist)
+        if self.render_mode == "blit":
+            artist.set_animated(True)
+
+    def invalidate_background(self):
+        """Forces the whole figure to be redrawn on the next frame. Must be called after changing a static artist, such as a horizontal line."""
+
+        self.background = None
+
+    def get_limits(self):
+        """Gets the x and y limits of every subplot."""
+
+        return [(subplot.get_xlim(), subplot.get_ylim()) for subplot in self.axes_list]
 
     def get_subplot(self, subplot_num):
         """Get a subplot by its index number"""
@@ -1067,73 +1461,92 @@ class UpdatingGraphFigure():
     def add_data_point(self, subplot_num, x, y):
         """Add data point to the desired subplot and update it"""
 
-        # Get current data coordinates for the desired graph and check if desired graph exists
+        # Get data buffer for the desired graph and check if desired graph exists
         try:
-            x_data = self.x_points[subplot_num]
-            y_data = self.y_points[subplot_num]
+            data_buffer = self.data_buffers[subplot_num]
         except IndexError:
             return
     
-        # Append coordinate points to list
-        x_data.append(x)
-        y_data.append(y)
+        # Append coordinate point to buffer
+        data_buffer.append(x, y)
+
+    def set_data(self, subplot_num, x_values, y_values):
+        """Replace every data point of the desired subplot with arrays of data points"""
+
+        # Get data buffer for the desired graph and check if desired graph exists
+        try:
+            data_buffer = self.data_buffers[subplot_num]
+        except IndexError:
+            return
+
+        data_buffer.clear()
+        data_buffer.append_batch(x_values, y_values)
+
+    def add_data_batch(self, subplot_num, x_values, y_values):
+        """Add arrays of data points to the desired subplot"""
+
+        # Get data buffer for the desired graph and check if desired graph exists
+        try:
+            data_buffer = self.data_buffers[subplot_num]
+        except IndexError:
+            return
+
+        # Append coordinate points to buffer
+        data_buffer.append_batch(x_values, y_values)
 
     def get_data_point(self, subplot_num, point_index):
         """Gets a datapoint from a subplot at a certain index"""
 
-        # Get current data coordinates for the desired graph and check if desired graph exists
+        # Get data point from the desired graph and check if both the graph and the point exist
         try:
-            x_point = self.x_points[subplot_num][point_index]
-            y_point = self.y_points[subplot_num][point_index]
+            return self.data_buffers[subplot_num].get(point_index)
         except IndexError:
             return None, None
-        
-        return x_point, y_point
     
 
     def get_data_within_last_x(self, subplot_num, min_x):
-        """Gets all data points on a subplot within the last data_period on the x axis."""
+        """
+            Gets all data points on a subplot within the last data_period on the x axis, oldest first.
+            The points are returned as views into the subplot's buffer, so they should not be modified.
+        """
 
         # Get correct subplot, and return nothing
         subplot = self.get_subplot(subplot_num)
         if subplot == None: return None
         
-        # Get data points of the subplot
-        subplot_x_points = self.x_points[subplot_num]
-        subplot_y_points = self.y_points[subplot_num]
-
-        x_within_boundaries = []
-        y_within_boundaries = []
+        return self.data_buffers[subplot_num].get_since(min_x)
+        
+    def set_center(self, x_center):
+        """Set the center of the graph in x."""
 
-        # Go through list of points backwards
-        index = 1
+        self.x_center = x_center
 
-        while True:
-            try:
-                # Get negative index to go through points backwards
-                x_point = subplot_x_points[-index]
-                y_point = subplot_y_points[-index]
-            except IndexError:
-                # If index is out of range
-                break
+    def get_view_center(self):
+        """Gets the center the graph is drawn at. If there is a scroll step, the center is snapped to it so the limits only change once every step."""
 
-            # If x point is smaller than min x, break the loop
-            if x_point < min_x:
-                break
+        if self.scroll_step == None:
+            return self.x_center
 
-            # Otherwise, add to points
-            x_within_boundaries.append(x_point)
-            y_within_boundaries.append(y_point)
+        return math.ceil(self.x_center / self.scroll_step) * self.scroll_step
 
-            index += 1
+    def get_window_state(self, subplot_num, min_x):
+        """
+            Gets the numbers of the first and last samples of a subplot at or after min_x. 
+            This only changes when a sample enters or leaves the window, so it can be used to check if the data in the window has changed.
+        """
 
+        data_buffer = self.data_buffers[subplot_num]
+        first_sample = data_buffer.total_appended - data_buffer.length + data_buffer.index_of_time(min_x)
+        return first_sample, data_buffer.total_appended
 
-        return x_within_boundaries, y_within_boundaries
-        
-    def set_center(self, x_center):
-        """Set the center of the graph in x."""
+    def get_render_state(self, data_period):
+        """
+            Gets a value that only changes when the graph would look different - when samples are added, 
+            the limits move or the background has been invalidated. Used to skip drawing frames where nothing has changed.
+        """
 
-        self.x_center = x_center
+        samples_added = tuple(data_buffer.total_appended for data_buffer in self.data_buffers)
+        return (samples_added, self.get_view_center(), data_period, self.background == None)
 
 
 
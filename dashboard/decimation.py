@@ -0,0 +1,40 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+import numpy as np
+
+def decimate_min_max(times, values, x_left, x_right, columns):
+    """
+        Reduces a line to at most about 2 points per pixel column, without losing its peaks.
+        The x range x_left to x_right is split into columns (the width of the plot in pixels), and only the minimum and maximum
+        of each column are kept, in time order, along with the first and last points. Drawn at that width, the line looks
+        the same as the full line, including every wave crest and trough.
+        times must be in increasing order. Returns arrays of the kept times and values.
+    """
+
+    count = len(times)
+    if columns <= 0 or count <= 2 * columns + 2:
+        return times, values
+
+    # Index each column starts at - points left or right of the range are put in the first or last column
+    column_width = (x_right - x_left) / columns
+    edges = x_left + np.arange(1, columns) * column_width
+    starts = np.concatenate(([0], np.searchsorted(times, edges, side="left")))
+
+    # Only keep columns with points in them
+    starts = np.unique(starts[starts < count])
+    lengths = np.diff(np.append(starts, count))
+
+    # Minimum and maximum of each column
+    minimums = np.minimum.reduceat(values, starts)
+    maximums = np.maximum.reduceat(values, starts)
+
+    # Index of the first point in each column that equals its minimum/maximum
+    indexes = np.arange(count)
+    minimum_indexes = np.minimum.reduceat(np.where(values == np.repeat(minimums, lengths), indexes, count), starts)
+    maximum_indexes = np.minimum.reduceat(np.where(values == np.repeat(maximums, lengths), indexes, count), starts)
+
+    # Keep the points in time order, along with the first and last points so the line still reaches the edges
+    kept = np.unique(np.concatenate(([0, count - 1], minimum_indexes, maximum_indexes)))
+    return times[kept], values[kept]
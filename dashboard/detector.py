@@ -0,0 +1,89 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+import threading
+import numpy as np
+
+# Constants used in water height calculations
+WATER_DENSITY = 997 # p - Density of water (kgm^-3)
+GRAVITY_FORCE = 9.81 # g - Weight of gravity (ms^-2)
+
+def calculate_water_height(pressure, calibrated_air_pressure):
+    """Calculate water height in centimetres using formula P = P0 + pgh"""
+
+    # Calculate water height (h) in metres using formula P = P0 + pgh
+    water_height = ((pressure - calibrated_air_pressure) * 100) / (WATER_DENSITY * GRAVITY_FORCE)
+
+    if water_height < 0:
+        return 0
+
+    # Convert water height into centimetres and return value
+    return (water_height * 100)
+
+def calculate_water_heights(pressures, calibrated_air_pressure):
+    """Calculate the water height in centimetres of every pressure in an array at once, using formula P = P0 + pgh"""
+
+    # Calculate water heights (h) in metres using formula P = P0 + pgh
+    water_heights = ((np.asarray(pressures, dtype=np.float64) - calibrated_air_pressure) * 100) / (WATER_DENSITY * GRAVITY_FORCE)
+
+    # Clamp negative heights to 0, then convert water heights into centimetres
+    return np.maximum(water_heights, 0) * 100
+
+
+class TsunamiDetector():
+    """
+        Checks pressure readings against the alarm threshold, and decides when the tsunami alarm should be activated.
+        Does not use tkinter or matplotlib, so it can run in the data transmitter's thread or process.
+    """
+
+    def __init__(self):
+
+        # Calibrated air pressure, standing water level and alarm threshold - if any is None, the alarm is not ready
+        # Kept in one tuple so it can be replaced from another thread in one step
+        self.settings = (None, None, None)
+
+        # Whether the alarm has been activated, and the pressure and wave height that activated it
+        self.alarm_sent = False
+        self.pressure_on_alarm_activate = None
+        self.wave_height_on_alarm_activate = None
+
+        # Set when the alarm is activated, so other threads can wait for it
+        self.alarm_event = threading.Event()
+
+    def configure(self, calibrated_air_pressure, standing_water_level, alarm_threshold):
+        """Set the calibration and alarm threshold used to check readings."""
+
+        self.settings = (calibrated_air_pressure, standing_water_level, alarm_threshold)
+
+    def is_ready(self):
+        """Returns True if the detector has everything it needs to check readings."""
+        return None not in self.settings
+
+    def reset_alarm(self):
+        """Allow the alarm to be activated again."""
+
+        self.pressure_on_alarm_activate = None
+        self.wave_height_on_alarm_activate = None
+        self.alarm_sent = False
+        self.alarm_event.clear()
+
+    def check(self, pressure):
+        """Checks a pressure reading. Returns True if it has just activated the alarm."""
+
+        calibrated_air_pressure, standing_water_level, alarm_threshold = self.settings
+
+        if self.alarm_sent or None in (calibrated_air_pressure, standing_water_level, alarm_threshold): return False
+
+        # Check if water height has broken threshold
+        wave_height = calculate_water_height(pressure, calibrated_air_pressure) - standing_water_level
+        if wave_height <= alarm_threshold: return False
+
+        # Save the pressure wave height on alarm activation
+        self.pressure_on_alarm_activate = pressure
+        self.wave_height_on_alarm_activate = wave_height
+
+        self.alarm_sent = True
+        self.alarm_event.set()
+
+        return True
@@ -0,0 +1,137 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+# Runs the tsunami detector without the dashboard, for unattended field boxes
+# Does not import tkinter or matplotlib, so it starts quickly and uses little memory
+
+#################### IMPORTS ####################
+from arduino_data import DataTransmitter
+from replay import ReplaySource
+from detector import calculate_water_heights
+import shared_samples
+from datetime import datetime
+import threading
+import argparse
+import time
+import sys
+
+
+def log(message):
+    """Prints a message with the current date and time."""
+    print("{} > {}".format(datetime.now().strftime("%d/%m/%Y %H:%M:%S"), message), flush=True)
+
+
+def collect_pressures(data_transmitter, length):
+    """Collects every pressure reading received in the next length seconds."""
+
+    # Throw away readings from before the calibration started
+    data_transmitter.sample_channel.drain()
+
+    time.sleep(length)
+
+    sample_times, pressures = data_transmitter.sample_channel.drain()
+    return pressures
+
+
+#################### MAIN ROUTINE ####################
+if __name__ == "__main__":
+
+    # Read command line options
+    parser = argparse.ArgumentParser(description="Headless tsunami detector")
+    parser.add_argument("--port", default="COM5", help="serial port the Arduino is connected to")
+    parser.add_argument("--baud", type=int, default=115200, help="baud rate of the serial port")
+    parser.add_argument("--framing", choices=["text", "binary"], default="text", help="format the Arduino sends data in")
+    parser.add_argument("--threshold", type=float, required=True, help="wave height in cm that activates the alarm")
+    parser.add_argument("--air-pressure", type=float, help="calibrated air pressure in hPa")
+    parser.add_argument("--calibrate-air", type=float, metavar="SECONDS", help="calibrate air pressure over this many seconds on startup (sensor out of the water)")
+    parser.add_argument("--standing-level", type=float, help="standing water level in cm")
+    parser.add_argument("--calibrate-standing", type=float, metavar="SECONDS", help="calibrate standing water level over this many seconds on startup (sensor in the water)")
+    parser.add_argument("--settle", type=float, default=30, help="seconds to wait between calibrating air pressure and standing water level")
+    parser.add_argument("--rearm", type=float, default=60, help="seconds after an activation before the alarm can be activated again")
+    parser.add_argument("--share", nargs="?", const=shared_samples.DEFAULT_NAME, default=None, metavar="NAME",
+                        help="share samples in shared memory under this name, so other programs can read them")
+    parser.add_argument("--record", metavar="DIRECTORY", help="record every sample to disk in this directory")
+    parser.add_argument("--replay", metavar="DIRECTORY", help="replay a recording instead of reading the Arduino, stopping at the end of it")
+    parser.add_argument("--speed", type=float, default=1.0, help="how many times faster than real time to replay, or 0 to replay as fast as possible")
+    args = parser.parse_args()
+
+    if (args.air_pressure == None) == (args.calibrate_air == None):
+        parser.error("give exactly one of --air-pressure and --calibrate-air")
+    if (args.standing_level == None) == (args.calibrate_standing == None):
+        parser.error("give exactly one of --standing-level and --calibrate-standing")
+
+    # Start the data transmitter - it waits until the serial port is connected
+    if args.replay != None:
+        data_transmitter = ReplaySource(dashboard=None, directory=args.replay, speed=args.speed if args.speed > 0 else None,
+                                        share_name=args.share, record_directory=args.record)
+    else:
+        data_transmitter = DataTransmitter(dashboard=None, framing=args.framing, share_name=args.share, record_directory=args.record)
+    data_thread = threading.Thread(target=data_transmitter.data_loop)
+    data_thread.start()
+
+    try:
+        # Connect to the Arduino
+        if not data_transmitter.connect_serial(args.port, args.baud):
+            log("Failed to connect to Arduino on {}".format(args.port))
+            sys.exit(1)
+        log("Arduino connected on {}".format(args.port))
+
+        # Calibrate air pressure
+        air_pressure = args.air_pressure
+        if air_pressure == None:
+            log("Calibrating air pressure for {:.0f} seconds...".format(args.calibrate_air))
+            pressures = collect_pressures(data_transmitter, args.calibrate_air)
+            if len(pressures) == 0:
+                log("Could not calibrate air pressure, lack of data")
+                sys.exit(1)
+            air_pressure = float(pressures.mean())
+        log("Air pressure calibrated to be {:.2f} hPa".format(air_pressure))
+
+        # Calibrate standing water level
+        standing_level = args.standing_level
+        if standing_level == None:
+            if args.calibrate_air != None:
+                log("Waiting {:.0f} seconds for the sensor to be placed in the water...".format(args.settle))
+                time.sleep(args.settle)
+
+            log("Calibrating standing water height for {:.0f} seconds...".format(args.calibrate_standing))
+            pressures = collect_pressures(data_transmitter, args.calibrate_standing)
+            if len(pressures) == 0:
+                log("Could not calibrate standing water height, lack of data")
+                sys.exit(1)
+            standing_level = float(calculate_water_heights(pressures, air_pressure).mean())
+        log("Standing water height calibrated to be {:.2f} cm".format(standing_level))
+
+        # Start checking for tsunamis
+        data_transmitter.configure_detection(air_pressure, standing_level, args.threshold)
+        log("Alarm threshold set to {:.2f} cm - alarm ready".format(args.threshold))
+
+        alarm_event = data_transmitter.detector.alarm_event
+        while True:
+
+            # Samples are not needed once they have been checked, so keep the sample channel empty
+            data_transmitter.sample_channel.drain()
+
+            if not alarm_event.wait(1):
+
+                # Stop at the end of a replay
+                if args.replay != None and data_transmitter.finished_event.is_set():
+                    log("Replay finished - alarm sent {} times".format(len(data_transmitter.alarm_times)))
+                    break
+                continue
+
+            # The data transmitter has already sent the alarm to the Arduino
+            detector = data_transmitter.detector
+            log("TSUNAMI ALARM ACTIVATED: pressure {:.2f} hPa, wave height {:.2f} cm".format(detector.pressure_on_alarm_activate,
+                                                                                                detector.wave_height_on_alarm_activate))
+
+            time.sleep(args.rearm)
+            data_transmitter.reset_alarm()
+            log("Alarm reset and set to Ready.")
+
+    except KeyboardInterrupt:
+        log("Stopping")
+
+    finally:
+        data_transmitter.stop()
+        data_thread.join()
@@ -3,28 +3,144 @@
 # CRISiSLab Challenge 2024
 
 #################### IMPORTS ####################
-from dashboard import Dashboard
+# Only modules needed to read the serial port are imported here - the dashboard (tkinter and matplotlib)
+# is imported after the serial port is open, so samples are collected while it loads
+import time
+start_time = time.time()
+start_counter = time.perf_counter()
+
 from arduino_data import DataTransmitter
+from acquisition import AcquisitionProcess
+from replay import ReplaySource
+from stage_timers import StageTimers
+import shared_samples
 import threading
+import argparse
 import os
- 
-#################### MAIN ROUTINE #################### 
+
+
+class StartupTimer():
+    """Records how long each stage of starting up takes, so slow startups can be diagnosed."""
+
+    def __init__(self, start_counter):
+
+        self.start_counter = start_counter
+        self.last_counter = start_counter
+        self.stages = []
+
+    def mark(self, stage):
+        """Records that a stage of starting up has finished."""
+
+        counter = time.perf_counter()
+        self.stages.append((stage, counter - self.last_counter))
+        self.last_counter = counter
+
+    def report(self):
+        """Prints how long each stage took."""
+
+        print("Startup took {:.2f} seconds:".format(self.last_counter - self.start_counter))
+        for stage, length in self.stages:
+            print("  {:<32} {:7.1f} ms".format(stage, length * 1000))
+
+
+#################### MAIN ROUTINE ####################
 if __name__ == "__main__":
 
+    startup_timer = StartupTimer(start_counter)
+    startup_timer.mark("Import serial modules")
+
+    # Read command line options
+    parser = argparse.ArgumentParser(description="Tsunami Alert Dashboard")
+    parser.add_argument("--port", default="COM5", help="serial port the Arduino is connected to")
+    parser.add_argument("--baud", type=int, default=115200, help="baud rate of the serial port")
+    parser.add_argument("--framing", choices=["text", "binary"], default="text", help="format the Arduino sends data in")
+    parser.add_argument("--process", action="store_true",
+                        help="read the serial port and check for tsunamis in a separate process, so the alarm does not depend on the GUI")
+    parser.add_argument("--share", nargs="?", const=shared_samples.DEFAULT_NAME, default=None, metavar="NAME",
+                        help="share samples in shared memory under this name, so other programs can read them (see shared_samples.py)")
+    parser.add_argument("--record", metavar="DIRECTORY",
+                        help="record every sample to disk in this directory, so the event record survives a crash (see recorder.py)")
+    parser.add_argument("--replay", metavar="DIRECTORY",
+                        help="replay a recording made with --record instead of reading the Arduino")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="how many times faster than real time to replay, or 0 to replay as fast as possible")
+    parser.add_argument("--timers", action="store_true",
+                        help="time each stage of the render loop and data loop (press F3 on the dashboard to show the times)")
+    parser.add_argument("--timers-dump", metavar="FILE", help="write a summary of the stage times to this file when the dashboard is closed")
+    args = parser.parse_args()
+
+    if args.replay != None and args.process:
+        parser.error("--replay cannot be used with --process")
+
+    # Paths given on the command line are relative to where the dashboard was started from
+    if args.record != None:
+        args.record = os.path.abspath(args.record)
+    if args.replay != None:
+        args.replay = os.path.abspath(args.replay)
+    if args.timers_dump != None:
+        args.timers_dump = os.path.abspath(args.timers_dump)
+
+    # Timers for each stage of the render loop and data loop - they do nothing unless enabled
+    stage_timers = StageTimers(enabled=args.timers or args.timers_dump != None)
+
     # Set working directory into main directory
     abspath = os.path.abspath(__file__)
     dname = os.path.dirname(abspath)
     os.chdir(dname)
 
-    # Create data transmitter object and dashboard
-    data_transmitter = DataTransmitter(dashboard=None)
-    dashboard = Dashboard("Tsunami Alert Dashboard", data_transmitter=data_transmitter)
+    if args.process:
+
+        # Start the acquisition process, which owns the serial port and the alarm
+        data_transmitter = AcquisitionProcess(framing=args.framing, share_name=args.share, record_directory=args.record)
+        data_transmitter.start()
+
+    else:
+
+        # Create data transmitter object, or a replay source that replays a recording through the same methods
+        if args.replay != None:
+            data_transmitter = ReplaySource(dashboard=None, directory=args.replay, speed=args.speed if args.speed > 0 else None,
+                                            share_name=args.share, record_directory=args.record, stage_timers=stage_timers,
+                                            wait_for_channel=True)
+        else:
+            data_transmitter = DataTransmitter(dashboard=None, framing=args.framing, share_name=args.share, record_directory=args.record, stage_timers=stage_timers)
+
+        # Run the data transmitter in a different thread
+        # This is to reduce lag on the GUI
+        data_thread = threading.Thread(target=data_transmitter.data_loop)
+        data_thread.start()
+
+    startup_timer.mark("Start data transmitter")
+
+    # Connect to the Arduino straight away, so samples are buffered in the sample channel while the dashboard loads
+    # If it cannot be connected, the connect button on the dashboard can be used to try again
+    if data_transmitter.connect_serial(args.port, args.baud):
+        startup_timer.mark("Connect to Arduino")
+    else:
+        startup_timer.mark("Connect to Arduino (failed)")
+
+    # Import the dashboard, which loads tkinter and matplotlib
+    from dashboard import Dashboard
+    startup_timer.mark("Import dashboard modules")
+
+    # Create dashboard
+    dashboard = Dashboard("Tsunami Alert Dashboard", data_transmitter=data_transmitter, serial_port=args.port, baud_rate=args.baud,
+                          start_time=start_time, stage_timers=stage_timers)
     data_transmitter.set_dashboard(dashboard)
+    startup_timer.mark("Create dashboard")
 
-    # Run the data transmitter in a different thread
-    # This is to reduce lag on the GUI
-    data_thread = threading.Thread(target=data_transmitter.data_loop)
-    data_thread.start()
+    # Draw the dashboard once before reporting, so the time until it is first shown is included
+    dashboard.update()
+    startup_timer.mark("Show dashboard")
+
+    startup_timer.report()
+    print("{} samples were buffered while the dashboard loaded".format(len(data_transmitter.sample_channel)))
 
     # Run the mainloop of the dashboard
-    dashboard.mainloop()
\ No newline at end of file
+    dashboard.mainloop()
+
+    # Stop the data transmitter once the dashboard is closed
+    data_transmitter.stop()
+
+    if args.timers_dump != None:
+        stage_timers.dump(args.timers_dump)
+        print("Stage times written to {}".format(args.timers_dump))
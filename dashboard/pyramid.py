@@ -0,0 +1,138 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+import numpy as np
+from sample_buffer import SampleRingBuffer
+
+class PyramidTier():
+    """
+        The minimum and maximum of samples in fixed width time buckets (e.g. every 10 seconds).
+        Finished buckets are stored in ring buffers, timed by the start of the bucket. The bucket samples are currently
+        arriving in is kept open until a sample arrives for a later bucket.
+    """
+
+    def __init__(self, width, capacity):
+
+        # Width of each bucket in seconds
+        self.width = width
+
+        # Finished buckets
+        self.minimums = SampleRingBuffer(capacity)
+        self.maximums = SampleRingBuffer(capacity)
+
+        # Number of the open bucket (its start time divided by the width), and the minimum and maximum of its samples
+        self.open_bucket = None
+        self.open_minimum = None
+        self.open_maximum = None
+
+    def add_batch(self, times, values):
+        """Adds arrays of samples, in time order."""
+
+        if len(times) == 0:
+            return
+
+        # Split the samples into groups in the same bucket - times only increase, so each bucket's samples are next to each other
+        buckets = np.floor(times / self.width).astype(np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+        group_buckets = buckets[starts]
+        minimums = np.minimum.reduceat(values, starts)
+        maximums = np.maximum.reduceat(values, starts)
+
+        # Add the first group to the open bucket if it is in the same bucket, otherwise the open bucket is finished
+        if self.open_bucket != None:
+            if group_buckets[0] <= self.open_bucket:
+                minimums[0] = min(minimums[0], self.open_minimum)
+                maximums[0] = max(maximums[0], self.open_maximum)
+                group_buckets[0] = self.open_bucket
+            else:
+                self.close_bucket(np.array([self.open_bucket]), np.array([self.open_minimum]), np.array([self.open_maximum]))
+
+        # Every group but the last is finished, and the last group becomes the open bucket
+        self.close_bucket(group_buckets[:-1], minimums[:-1], maximums[:-1])
+
+        self.open_bucket = int(group_buckets[-1])
+        self.open_minimum = float(minimums[-1])
+        self.open_maximum = float(maximums[-1])
+
+    def close_bucket(self, buckets, minimums, maximums):
+        """Stores arrays of finished buckets."""
+
+        bucket_times = buckets * self.width
+        self.minimums.append_batch(bucket_times, minimums)
+        self.maximums.append_batch(bucket_times, maximums)
+
+    def covers(self, min_time):
+        """Returns True if every bucket from min_time onwards is still stored."""
+        return len(self.minimums) < self.minimums.capacity or self.minimums.get_times()[0] <= min_time
+
+    def get_since(self, min_time):
+        """Returns arrays of the start times, minimums and maximums of every bucket (including the open bucket) that ends after min_time."""
+
+        bucket_times, minimums = self.minimums.get_since(min_time - self.width)
+        maximums = self.maximums.get_since(min_time - self.width)[1]
+
+        if self.open_bucket != None:
+            bucket_times = np.append(bucket_times, self.open_bucket * self.width)
+            minimums = np.append(minimums, self.open_minimum)
+            maximums = np.append(maximums, self.open_maximum)
+
+        return bucket_times, minimums, maximums
+
+
+class TimeSeriesPyramid():
+    """
+        Keeps the minimum and maximum of a series of samples at several resolutions (by default 1 second, 10 seconds,
+        1 minute and 10 minutes), updated as samples arrive. Any span of history, from seconds to days, can be drawn from
+        the coarsest resolution that still has a point per pixel, so drawing costs the same however long the span is.
+    """
+
+    DEFAULT_WIDTHS = (1, 10, 60, 600)
+
+    # Buckets kept per tier - with the default widths, 4.5 hours at 1 second up to 113 days at 10 minutes
+    DEFAULT_CAPACITY = 16384
+
+    def __init__(self, widths=DEFAULT_WIDTHS, capacity=DEFAULT_CAPACITY):
+
+        self.tiers = [PyramidTier(width, capacity) for width in sorted(widths)]
+
+    def add_batch(self, times, values):
+        """Adds arrays of samples, in time order."""
+
+        for tier in self.tiers:
+            tier.add_batch(times, values)
+
+    def get_tier(self, min_time, max_time, columns):
+        """
+            Gets the finest tier with at most one bucket per column between min_time and max_time that still covers min_time.
+            If no tier has buckets that wide, the coarsest tier is used.
+        """
+
+        for tier in self.tiers:
+            if tier.width * columns >= max_time - min_time and tier.covers(min_time):
+                return tier
+
+        return self.tiers[-1]
+
+    def get_envelope(self, min_time, max_time, columns):
+        """
+            Returns arrays of times and values for drawing the history between min_time and max_time as a line at most columns
+            pixels wide. Each bucket is drawn as its minimum then its maximum, at the middle of the bucket, so no peaks are lost.
+        """
+
+        tier = self.get_tier(min_time, max_time, columns)
+        bucket_times, minimums, maximums = tier.get_since(min_time)
+
+        times = np.repeat(bucket_times + tier.width / 2, 2)
+        values = np.column_stack((minimums, maximums)).ravel()
+        return times, values
+
+    def get_extremes(self, min_time, max_time, columns):
+        """Gets the (minimum, maximum) of the history drawn between min_time and max_time, or (None, None) if there is none."""
+
+        tier = self.get_tier(min_time, max_time, columns)
+        bucket_times, minimums, maximums = tier.get_since(min_time)
+
+        if len(bucket_times) == 0:
+            return None, None
+        return float(minimums.min()), float(maximums.max())
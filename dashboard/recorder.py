@@ -0,0 +1,270 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+import numpy as np
+import threading
+import traceback
+import queue
+import time
+import os
+
+# Name of the file listing the time range of every chunk in a recording
+INDEX_FILE = "index.csv"
+
+
+def get_chunk_path(directory, chunk_number):
+    """Gets the path of a chunk file in a recording directory."""
+    return os.path.join(directory, "chunk_{:06d}.bin".format(chunk_number))
+
+
+def read_index(directory):
+    """Reads the index of a recording. Returns a list of (chunk number, first time, last time, sample count), oldest first."""
+
+    index = []
+
+    try:
+        with open(os.path.join(directory, INDEX_FILE)) as index_file:
+            next(index_file) # Skip header
+            for line in index_file:
+                chunk_number, first_time, last_time, count = line.strip().split(",")
+                index.append((int(chunk_number), float(first_time), float(last_time), int(count)))
+    except FileNotFoundError:
+        pass
+
+    return index
+
+
+class SampleRecorder():
+    """
+        Records (time, pressure) samples to disk as they arrive, so the event record survives a crash.
+        Samples are stored in fixed size chunk files, each holding a time column followed by a pressure column of float64s.
+        Chunks are memory mapped, so appending a sample is a memory copy. Unused slots are NaN.
+        The mapped chunk is flushed to disk, and the index of chunk time ranges rewritten, every sync_interval seconds.
+    """
+
+    DEFAULT_CHUNK_SIZE = 65536
+
+    def __init__(self, directory, chunk_size=DEFAULT_CHUNK_SIZE, sync_interval=5.0):
+
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.sync_interval = sync_interval
+
+        os.makedirs(directory, exist_ok=True)
+
+        # Time range of every chunk - continue after any chunks already in the directory
+        self.index = read_index(directory)
+        self.chunk_number = self.index[-1][0] + 1 if self.index else 0
+
+        # If the last recorder stopped without syncing its last chunk, the index entry is out of date, so rebuild it from the chunk
+        if self.index:
+            self.recover_chunk()
+
+        # Currently mapped chunk and amount of samples written to it
+        self.chunk = None
+        self.chunk_length = 0
+
+        # Time of the last sync, and whether samples have been written since
+        self.last_sync = time.monotonic()
+        self.unsynced = False
+
+    def recover_chunk(self):
+        """Rebuilds the index entry of the last chunk in the directory from the samples in its file (unused slots are NaN)."""
+
+        chunk_number = self.index[-1][0]
+        try:
+            chunk = np.memmap(get_chunk_path(self.directory, chunk_number), dtype=np.float64, mode="r").reshape(2, -1)
+        except (FileNotFoundError, ValueError):
+            return
+
+        chunk_times = chunk[0][~np.isnan(chunk[0])]
+        if len(chunk_times) == 0:
+            self.index[-1] = (chunk_number, float("nan"), float("nan"), 0)
+        else:
+            self.index[-1] = (chunk_number, float(chunk_times[0]), float(chunk_times[-1]), len(chunk_times))
+        self.write_index()
+
+    def open_chunk(self):
+        """Creates and maps the next chunk file, filled with NaN."""
+
+        self.chunk = np.memmap(get_chunk_path(self.directory, self.chunk_number), dtype=np.float64, mode="w+", shape=(2, self.chunk_size))
+        self.chunk[:] = np.nan
+        self.chunk_length = 0
+
+        # List the chunk in the index straight away, so it can be found after a crash even if it was never synced
+        self.index.append((self.chunk_number, float("nan"), float("nan"), 0))
+        self.write_index()
+
+    def close_chunk(self):
+        """Flushes and unmaps the current chunk, and moves on to the next chunk number."""
+
+        self.chunk.flush()
+        self.chunk = None
+        self.chunk_number += 1
+
+    def append_batch(self, samples):
+        """Writes a list of (time, pressure) samples to the recording, syncing to disk if sync_interval has passed."""
+
+        position = 0
+        while position < len(samples):
+
+            if self.chunk is None:
+                self.open_chunk()
+
+            # Write as many samples as fit in the current chunk
+            batch = samples[position:position + self.chunk_size - self.chunk_length]
+            batch_times, batch_pressures = zip(*batch)
+            self.chunk[0, self.chunk_length:self.chunk_length + len(batch)] = batch_times
+            self.chunk[1, self.chunk_length:self.chunk_length + len(batch)] = batch_pressures
+            self.chunk_length += len(batch)
+            position += len(batch)
+
+            # Update the time range of the chunk
+            chunk_number, first_time, last_time, count = self.index[-1]
+            if count == 0:
+                first_time = batch_times[0]
+            self.index[-1] = (chunk_number, first_time, batch_times[-1], self.chunk_length)
+            self.unsynced = True
+
+            # Move on to a new chunk once this one is full
+            if self.chunk_length == self.chunk_size:
+                self.close_chunk()
+                self.write_index()
+
+        if self.unsynced and time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """Flushes the current chunk to disk and rewrites the index."""
+
+        if self.chunk is not None:
+            self.chunk.flush()
+        self.write_index()
+
+        self.last_sync = time.monotonic()
+        self.unsynced = False
+
+    def write_index(self):
+        """Rewrites the index file. It is written to a temporary file first, so a crash never leaves a half written index."""
+
+        temporary_path = os.path.join(self.directory, INDEX_FILE + ".tmp")
+        with open(temporary_path, "w") as index_file:
+            index_file.write("chunk,first_time,last_time,count\n")
+            for chunk_number, first_time, last_time, count in self.index:
+                index_file.write("{},{!r},{!r},{}\n".format(chunk_number, first_time, last_time, count))
+            index_file.flush()
+            os.fsync(index_file.fileno())
+
+        os.replace(temporary_path, os.path.join(self.directory, INDEX_FILE))
+
+    def close(self):
+        """Syncs everything to disk and stops recording."""
+
+        self.sync()
+        if self.chunk is not None:
+            self.close_chunk()
+
+
+class BackgroundRecorder():
+    """
+        Records samples with a SampleRecorder on its own thread, so opening chunks and syncing them to disk never delays
+        the data loop (and the alarm check of the next samples). append_batch only puts the samples in a queue.
+        If the disk stalls, samples wait in the queue until it catches up.
+    """
+
+    def __init__(self, directory, chunk_size=SampleRecorder.DEFAULT_CHUNK_SIZE, sync_interval=5.0):
+
+        self.recorder = SampleRecorder(directory, chunk_size=chunk_size, sync_interval=sync_interval)
+
+        # Lists of samples waiting to be recorded - None tells the thread to stop
+        self.queue = queue.Queue()
+
+        self.thread = threading.Thread(target=self.record_loop, daemon=True)
+        self.thread.start()
+
+    def append_batch(self, samples):
+        """Queues a list of (time, pressure) samples to be recorded."""
+        self.queue.put(samples)
+
+    def record_loop(self):
+        """Records queued samples until close() is called, syncing any unsynced samples if none arrive for sync_interval seconds."""
+
+        while True:
+
+            try:
+                samples = self.queue.get(timeout=self.recorder.sync_interval)
+            except queue.Empty:
+                samples = []
+
+            if samples is None:
+                break
+
+            # Keep recording if the disk fails for a moment (e.g. it is full), instead of stopping the thread and filling the queue
+            try:
+                if len(samples) > 0:
+                    self.recorder.append_batch(samples)
+                elif self.recorder.unsynced:
+                    self.recorder.sync()
+            except OSError:
+                print("Could not record samples:", flush=True)
+                traceback.print_exc()
+
+        self.recorder.close()
+
+    def close(self):
+        """Records every queued sample, syncs everything to disk and stops recording."""
+
+        self.queue.put(None)
+        self.thread.join()
+
+
+class RecordingReader():
+    """Reads samples from a recording made by a SampleRecorder."""
+
+    def __init__(self, directory):
+
+        self.directory = directory
+        self.index = read_index(directory)
+
+    def get_time_range(self):
+        """Gets the (first time, last time) of the recording, or None if it is empty."""
+
+        chunks = [chunk for chunk in self.index if chunk[3] > 0]
+        if not chunks:
+            return None
+        return chunks[0][1], chunks[-1][2]
+
+    def read(self, start_time=None, end_time=None):
+        """Returns arrays of the times and pressures of every sample recorded between start_time and end_time (inclusive), oldest first."""
+
+        times = []
+        pressures = []
+
+        for chunk_number, first_time, last_time, count in self.index:
+
+            # Use the index to skip chunks outside the time range without opening them
+            # The newest chunk may have more samples than the index says if the recorder crashed before syncing, so it is always opened
+            is_newest = chunk_number == self.index[-1][0]
+            if not is_newest and (count == 0 or (start_time != None and last_time < start_time) or (end_time != None and first_time > end_time)):
+                continue
+
+            try:
+                chunk = np.memmap(get_chunk_path(self.directory, chunk_number), dtype=np.float64, mode="r")
+            except (FileNotFoundError, ValueError):
+                continue
+            chunk = chunk.reshape(2, -1)
+
+            # Keep samples in the time range (unused slots are NaN, which never match)
+            mask = ~np.isnan(chunk[0])
+            if start_time != None:
+                mask &= chunk[0] >= start_time
+            if end_time != None:
+                mask &= chunk[0] <= end_time
+
+            times.append(chunk[0][mask])
+            pressures.append(chunk[1][mask])
+
+        if not times:
+            return np.empty(0), np.empty(0)
+        return np.concatenate(times), np.concatenate(pressures)
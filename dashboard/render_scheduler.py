@@ -0,0 +1,117 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+from stage_timers import StageTimers
+import traceback
+import time
+
+class RenderScheduler():
+    """
+        Runs a render function on a tkinter window's event loop at a capped frame rate, using after() instead of a busy loop.
+        The render function should return True if it drew a frame, or False if nothing had changed and the frame was skipped.
+    """
+
+    def __init__(self, window, render_function, target_fps=30, stats_callback=None, stage_timers=None):
+
+        self.window = window
+        self.render_function = render_function
+        self.target_fps = target_fps
+
+        # Called once a second with the achieved frames per second and average frame time in milliseconds
+        self.stats_callback = stats_callback
+
+        self.running = False
+        self.after_id = None
+
+        # Times how late each tick starts, which is time spent by tkinter handling other events
+        self.stage_timers = stage_timers if stage_timers != None else StageTimers()
+        self.next_tick_time = None
+
+        # Frame statistics
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+        self.frames_failed = 0
+        self.achieved_fps = 0.0
+        self.frame_time = 0.0
+
+        # Frames rendered and time spent rendering since the statistics were last calculated
+        self.stats_start_time = time.perf_counter()
+        self.stats_frames = 0
+        self.stats_render_time = 0.0
+
+    def set_target_fps(self, target_fps):
+        """Change the frame rate the scheduler aims for."""
+
+        if target_fps <= 0:
+            raise ValueError("Target FPS must be greater than 0")
+        self.target_fps = target_fps
+
+    def start(self):
+        """Start rendering frames."""
+
+        if self.running: return
+
+        self.running = True
+        self.after_id = self.window.after(0, self.tick)
+
+    def stop(self):
+        """Stop rendering frames."""
+
+        self.running = False
+        if self.after_id != None:
+            self.window.after_cancel(self.after_id)
+            self.after_id = None
+
+    def tick(self):
+        """Render a frame, then schedule the next one so frames are spaced out by the target frame rate."""
+
+        if not self.running: return
+
+        frame_start = time.perf_counter()
+        try:
+            self.render_frame(frame_start)
+        finally:
+            # Always schedule the next tick, even if something failed, so the dashboard keeps updating
+            frame_interval = 1 / self.target_fps
+            delay = max(frame_interval - (time.perf_counter() - frame_start), 0)
+            self.after_id = self.window.after(int(delay * 1000), self.tick)
+            self.next_tick_time = time.perf_counter() + int(delay * 1000) / 1000
+
+    def render_frame(self, frame_start):
+        """Calls the render function and records frame statistics. If the render function fails, the error is printed and the frame is counted as failed."""
+
+        if self.stage_timers.enabled and self.next_tick_time != None:
+            self.stage_timers.add("tk_event_loop", max(frame_start - self.next_tick_time, 0))
+
+        try:
+            rendered = self.render_function()
+        except Exception:
+            print("Error while rendering a frame:", flush=True)
+            traceback.print_exc()
+            rendered = None
+        frame_end = time.perf_counter()
+
+        # Record frame statistics
+        if rendered:
+            self.frames_rendered += 1
+            self.stats_frames += 1
+            self.stats_render_time += frame_end - frame_start
+        elif rendered == False:
+            self.frames_skipped += 1
+        else:
+            self.frames_failed += 1
+
+        # Calculate achieved frame rate and frame time once a second
+        stats_elapsed = frame_end - self.stats_start_time
+        if stats_elapsed >= 1:
+            self.achieved_fps = self.stats_frames / stats_elapsed
+            if self.stats_frames > 0:
+                self.frame_time = self.stats_render_time / self.stats_frames * 1000
+
+            self.stats_start_time = frame_end
+            self.stats_frames = 0
+            self.stats_render_time = 0.0
+
+            if self.stats_callback != None:
+                self.stats_callback(self.achieved_fps, self.frame_time)
@@ -0,0 +1,116 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+from arduino_data import DataTransmitter
+from recorder import RecordingReader
+import numpy as np
+import threading
+import time
+
+class ReplaySource(DataTransmitter):
+    """
+        Replays a recording made by a SampleRecorder in place of the Arduino, so the dashboard and tsunami detector can be tested
+        against recorded events without a serial port. Has the same methods as DataTransmitter, and can be given to the dashboard in place of one.
+
+        speed is how many times faster than real time to replay (1 for real time), or None to replay as fast as possible.
+        Samples are given new times as if they were being measured now, keeping their recorded spacing. When replaying as fast
+        as possible, the recording is timed so its last sample was measured when the replay started, so every sample is in the past.
+        If wait_for_channel is True, replaying as fast as possible waits for room in the sample channel instead of overflowing it,
+        so a dashboard that is still loading (or falls behind) receives every sample. Only set it if something drains the channel.
+    """
+
+    # Amount of samples replayed at a time when replaying as fast as possible
+    BATCH_SIZE = 256
+
+    # Longest time in seconds the replay sleeps at a time, so it can check if it should stop
+    SLEEP_INTERVAL = 0.05
+
+    def __init__(self, dashboard, directory, speed=1.0, share_name=None, record_directory=None, stage_timers=None, wait_for_channel=False):
+
+        super().__init__(dashboard, share_name=share_name, record_directory=record_directory, stage_timers=stage_timers)
+
+        if speed != None and speed <= 0:
+            raise ValueError("Replay speed must be greater than 0")
+        self.speed = speed
+        self.wait_for_channel = wait_for_channel
+
+        # Recorded sample times and pressures
+        self.recorded_times, self.recorded_pressures = RecordingReader(directory).read()
+
+        # Whether the replay has been started by connect_serial(), and the index of the next sample to replay
+        self.replaying = False
+        self.position = 0
+
+        # Set once every recorded sample has been replayed
+        self.finished_event = threading.Event()
+
+        # Times the alarm was sent, in seconds since the epoch
+        self.alarm_times = []
+
+    def connect_serial(self, port=None, baud_rate=None):
+        """Starts the replay. The port and baud rate are ignored. Always returns True."""
+
+        self.replaying = True
+        self.update_ready()
+        return True
+
+    def is_serial_connected(self):
+        """Returns True once the replay has been started."""
+        return self.replaying
+
+    def send_alarm(self):
+        """Records when the alarm was sent, instead of sending it to an Arduino."""
+
+        self.alarm_times.append(time.time())
+        print("Replay: ALARM sent", flush=True)
+
+    def data_loop(self):
+        """Replays the recorded samples once the replay is started, until every sample has been replayed or stop() is called."""
+
+        # Wait until the replay is started
+        while not self.break_loop and not self.ready_event.is_set():
+            self.ready_event.wait(self.READ_TIMEOUT)
+
+        replay_start = time.time()
+        first_time = self.recorded_times[0] if len(self.recorded_times) > 0 else 0
+        last_time = self.recorded_times[-1] if len(self.recorded_times) > 0 else 0
+
+        while not self.break_loop and self.position < len(self.recorded_times):
+
+            if self.speed == None:
+
+                # If a dashboard is collecting the samples, wait until there is room in the sample channel so none are thrown away
+                if self.wait_for_channel and self.sample_channel.capacity - len(self.sample_channel) < self.BATCH_SIZE:
+                    time.sleep(0.001)
+                    continue
+
+                end = min(self.position + self.BATCH_SIZE, len(self.recorded_times))
+                sample_times = (replay_start - (last_time - self.recorded_times[self.position:end])).tolist()
+
+            else:
+
+                # Replay every sample that is due, then sleep until the next sample is due
+                replay_time = first_time + (time.time() - replay_start) * self.speed
+                end = int(np.searchsorted(self.recorded_times, replay_time, side="right"))
+
+                if end == self.position:
+                    time.sleep(min((self.recorded_times[end] - replay_time) / self.speed, self.SLEEP_INTERVAL))
+                    continue
+
+                sample_times = [replay_start + (recorded_time - first_time) / self.speed for recorded_time in self.recorded_times[self.position:end].tolist()]
+
+            pressures = self.recorded_pressures[self.position:end].tolist()
+            self.position = end
+
+            start = self.stage_timers.start()
+            self.handle_samples(list(zip(sample_times, pressures)))
+            self.stage_timers.stop("handle_samples", start)
+
+        self.finished_event.set()
+
+        # Keep the shared memory and recording open until stopped, like the data transmitter
+        while not self.break_loop:
+            time.sleep(self.SLEEP_INTERVAL)
+
+        self.close_outputs()
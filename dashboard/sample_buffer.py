@@ -0,0 +1,128 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+import numpy as np
+
+class SampleRingBuffer():
+    """
+        A fixed size store of (time, value) samples backed by preallocated NumPy arrays.
+        Once the buffer is full, every new sample overwrites the oldest one, so memory use never grows.
+    """
+
+    # Default amount of samples kept - a little under 2 hours of data at the Arduino's 10Hz
+    DEFAULT_CAPACITY = 65536
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+
+        if capacity <= 0:
+            raise ValueError("Ring buffer capacity must be greater than 0")
+
+        self.capacity = capacity
+
+        # Time and value columns. Every sample is written twice, capacity positions apart,
+        # so the newest samples are always stored next to each other and can be returned as a view without copying
+        self.times = np.zeros(capacity * 2, dtype=np.float64)
+        self.values = np.zeros(capacity * 2, dtype=np.float64)
+
+        # Position the next sample will be written to (always between 0 and capacity - 1)
+        self.write_index = 0
+
+        # Amount of samples currently stored
+        self.length = 0
+
+        # Amount of samples ever appended - increases even after old samples are overwritten
+        self.total_appended = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, time, value):
+        """Add a sample to the end of the buffer, overwriting the oldest sample if the buffer is full."""
+
+        index = self.write_index
+
+        # Write sample into both halves of the arrays
+        self.times[index] = time
+        self.times[index + self.capacity] = time
+        self.values[index] = value
+        self.values[index + self.capacity] = value
+
+        # Move write position forward, wrapping around to the start
+        self.write_index = (index + 1) % self.capacity
+
+        if self.length < self.capacity:
+            self.length += 1
+        self.total_appended += 1
+
+    def append_batch(self, times, values):
+        """Add arrays of samples to the end of the buffer in one step. If more samples are given than fit, only the newest are kept."""
+
+        count = len(times)
+        if count == 0:
+            return
+
+        # Samples that would be overwritten within this batch are skipped, but still take up their positions
+        skipped = max(count - self.capacity, 0)
+        times = np.asarray(times, dtype=np.float64)[skipped:]
+        values = np.asarray(values, dtype=np.float64)[skipped:]
+
+        # Positions to write the samples to, wrapping around the end of the first half
+        positions = (self.write_index + skipped + np.arange(count - skipped)) % self.capacity
+
+        # Write samples into both halves of the arrays
+        self.times[positions] = times
+        self.times[positions + self.capacity] = times
+        self.values[positions] = values
+        self.values[positions + self.capacity] = values
+
+        self.write_index = (self.write_index + count) % self.capacity
+        self.length = min(self.length + count, self.capacity)
+        self.total_appended += count
+
+    def clear(self):
+        """Remove all samples from the buffer."""
+
+        self.write_index = 0
+        self.length = 0
+
+    def get(self, index):
+        """Gets the sample at a certain index (negative indexes count back from the newest sample). Raises IndexError if out of range."""
+
+        if index < 0:
+            index += self.length
+        if index < 0 or index >= self.length:
+            raise IndexError("Sample index out of range")
+
+        position = self.start_position() + index
+        return self.times[position], self.values[position]
+
+    def start_position(self):
+        """Gets the position in the arrays of the oldest stored sample."""
+        return self.write_index + self.capacity - self.length
+
+    def get_times(self):
+        """Returns a view of every stored time value, oldest first."""
+
+        start = self.start_position()
+        return self.times[start:start + self.length]
+
+    def get_values(self):
+        """Returns a view of every stored value, oldest first."""
+
+        start = self.start_position()
+        return self.values[start:start + self.length]
+
+    def index_of_time(self, min_time):
+        """Gets the index of the oldest sample recorded at or after min_time, or the buffer length if there is none."""
+
+        # Times only ever increase, so a binary search can be used instead of checking every sample
+        return int(np.searchsorted(self.get_times(), min_time, side="left"))
+
+    def get_since(self, min_time):
+        """Returns views of the times and values of every sample recorded at or after min_time, oldest first."""
+
+        start = self.start_position() + self.index_of_time(min_time)
+        end = self.start_position() + self.length
+
+        return self.times[start:end], self.values[start:end]
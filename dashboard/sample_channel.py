@@ -0,0 +1,116 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+import numpy as np
+
+class SampleChannel():
+    """
+        A queue of (time, pressure) samples passed from one producer thread (the data transmitter) to one consumer thread (the dashboard).
+        Samples are stored in preallocated slots. Only the producer changes the head counter and only the consumer changes the tail counter,
+        so no locks are needed.
+
+        If buffer is given (e.g. the buf of a multiprocessing SharedMemory of at least buffer_size(capacity) bytes), the counters and slots
+        are stored in it, so the producer and consumer can be in different processes.
+    """
+
+    DEFAULT_CAPACITY = 4096
+
+    # Bytes taken by the head, tail and overflow counters at the start of the buffer
+    COUNTERS_SIZE = 24
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, buffer=None):
+
+        if capacity <= 0:
+            raise ValueError("Channel capacity must be greater than 0")
+
+        self.capacity = capacity
+
+        if buffer == None:
+            buffer = bytearray(self.buffer_size(capacity))
+
+        # Total amount of samples written by the producer (head), and read by the consumer (tail), and amount of samples
+        # thrown away because the consumer fell too far behind and the channel was full (only changed by the producer)
+        # The slot of a sample is its count modulo the capacity
+        self.counters = np.ndarray(3, dtype=np.int64, buffer=buffer)
+
+        # Preallocated slots for sample times and pressures
+        self.times = np.ndarray(capacity, dtype=np.float64, buffer=buffer, offset=self.COUNTERS_SIZE)
+        self.values = np.ndarray(capacity, dtype=np.float64, buffer=buffer, offset=self.COUNTERS_SIZE + capacity * 8)
+
+    @staticmethod
+    def buffer_size(capacity):
+        """Gets the amount of bytes needed to store a channel with a certain capacity."""
+        return SampleChannel.COUNTERS_SIZE + capacity * 16
+
+    @property
+    def head(self):
+        return int(self.counters[0])
+
+    @head.setter
+    def head(self, head):
+        self.counters[0] = head
+
+    @property
+    def tail(self):
+        return int(self.counters[1])
+
+    @tail.setter
+    def tail(self, tail):
+        self.counters[1] = tail
+
+    @property
+    def overflowed_samples(self):
+        return int(self.counters[2])
+
+    @overflowed_samples.setter
+    def overflowed_samples(self, overflowed_samples):
+        self.counters[2] = overflowed_samples
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def release(self):
+        """Stops using the buffer, so a shared memory block it is stored in can be closed."""
+
+        self.counters = None
+        self.times = None
+        self.values = None
+
+    def push(self, time, value):
+        """Adds a sample to the channel. Only called by the producer. Returns False if the channel is full and the sample was thrown away."""
+
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.overflowed_samples += 1
+            return False
+
+        # Fill the slot before moving the head, so the consumer never sees a slot that has not been written yet
+        slot = head % self.capacity
+        self.times[slot] = time
+        self.values[slot] = value
+        self.head = head + 1
+
+        return True
+
+    def push_batch(self, samples):
+        """Adds a list of (time, value) samples to the channel. Only called by the producer."""
+
+        for time, value in samples:
+            self.push(time, value)
+
+    def drain(self):
+        """Removes every sample in the channel, and returns copies of their times and values, oldest first. Only called by the consumer."""
+
+        tail = self.tail
+        head = self.head
+
+        # Copy samples out of their slots, wrapping around the end of the arrays if needed
+        slots = np.arange(tail, head) % self.capacity
+        times = self.times[slots]
+        values = self.values[slots]
+
+        # Free the slots for the producer
+        self.tail = head
+
+        return times, values
@@ -0,0 +1,250 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing import resource_tracker
+import numpy as np
+import argparse
+import time
+import os
+
+# Name the data transmitter shares its samples under by default
+DEFAULT_NAME = "crisislab_samples"
+
+# Value at the start of the shared memory, so readers can check it really is a sample ring
+MAGIC_NUMBER = 0x43524953
+
+
+def attach_shared_memory(name):
+    """Attaches to existing shared memory without this process becoming responsible for removing it."""
+
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        memory = SharedMemory(name=name)
+
+        # Before Python 3.13, attaching registers the memory with this process's resource tracker,
+        # which would remove it when this process exits even though the writer is still using it
+        if os.name == "posix":
+            resource_tracker.unregister(memory._name, "shared_memory")
+
+        return memory
+
+
+class SharedSampleRing():
+    """
+        The newest (time, pressure) samples kept in named shared memory, written by one process and read by any number of others.
+        Layout: a header of 4 int64s (magic number, capacity, samples written, process ID of the writer) followed by the time and pressure columns.
+        Like SampleRingBuffer, every sample is written twice, capacity positions apart, so the newest samples can always be read as one view.
+    """
+
+    HEADER_SIZE = 32
+
+    def __init__(self, memory, capacity):
+
+        self.memory = memory
+        self.capacity = capacity
+
+        buffer = memory.buf
+        self.header = np.ndarray(4, dtype=np.int64, buffer=buffer)
+        self.times = np.ndarray(capacity * 2, dtype=np.float64, buffer=buffer, offset=self.HEADER_SIZE)
+        self.values = np.ndarray(capacity * 2, dtype=np.float64, buffer=buffer, offset=self.HEADER_SIZE + capacity * 16)
+
+    @classmethod
+    def create(cls, name=DEFAULT_NAME, capacity=65536):
+        """Creates a new sample ring in shared memory. The process that creates it is the only one that should write to it."""
+
+        size = cls.HEADER_SIZE + capacity * 32
+        try:
+            memory = SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+
+            # A previous run that crashed can leave its shared memory behind, so remove it and create it again
+            # If its writer is still running, the name is in use, so leave it alone
+            # On Windows, shared memory only exists while a program has it open, so it is always still in use
+            if os.name != "posix" or not cls.is_stale(name):
+                raise FileExistsError("Shared memory '{}' is still in use by another program - share under a different name, "
+                                      "or remove it if that program is no longer running".format(name)) from None
+
+            print("Removing shared memory '{}' left behind by a previous run".format(name), flush=True)
+            stale_memory = SharedMemory(name=name)
+            stale_memory.close()
+            stale_memory.unlink()
+
+            memory = SharedMemory(name=name, create=True, size=size)
+
+        ring = cls(memory, capacity)
+
+        ring.header[1] = capacity
+        ring.header[2] = 0
+        ring.header[3] = os.getpid()
+        ring.header[0] = MAGIC_NUMBER
+
+        return ring
+
+    @staticmethod
+    def is_stale(name):
+        """Returns True if the shared memory under a name is a sample ring whose writer is no longer running (POSIX only)."""
+
+        memory = attach_shared_memory(name)
+        try:
+            if memory.size < SharedSampleRing.HEADER_SIZE:
+                return False
+
+            header = np.ndarray(4, dtype=np.int64, buffer=memory.buf)
+            magic_number, writer_pid = int(header[0]), int(header[3])
+            del header
+        finally:
+            memory.close()
+
+        # Shared memory that is not a sample ring belongs to another program
+        if magic_number != MAGIC_NUMBER:
+            return False
+
+        # If the writer is unknown, it may still be running
+        if writer_pid <= 0:
+            return False
+
+        # Signal 0 only checks whether the process exists
+        try:
+            os.kill(writer_pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    @classmethod
+    def attach(cls, name=DEFAULT_NAME):
+        """Attaches to a sample ring created by another process. The arrays are made read-only."""
+
+        memory = attach_shared_memory(name)
+
+        header = np.ndarray(4, dtype=np.int64, buffer=memory.buf)
+        if header[0] != MAGIC_NUMBER:
+            del header
+            memory.close()
+            raise ValueError("Shared memory '{}' is not a sample ring".format(name))
+        capacity = int(header[1])
+        del header
+
+        ring = cls(memory, capacity)
+        ring.times.setflags(write=False)
+        ring.values.setflags(write=False)
+
+        return ring
+
+    def get_written(self):
+        """Gets the total amount of samples ever written to the ring."""
+        return int(self.header[2])
+
+    def append_batch(self, samples):
+        """Writes a list of (time, value) samples to the ring. Only called by the process that created it."""
+
+        written = self.get_written()
+
+        for time, value in samples:
+            index = written % self.capacity
+            self.times[index] = time
+            self.times[index + self.capacity] = time
+            self.values[index] = value
+            self.values[index + self.capacity] = value
+            written += 1
+
+        # Update the count after the samples are written, so readers never see unwritten samples
+        self.header[2] = written
+
+    def get_range(self, first, last):
+        """
+            Returns views of the times and values of samples numbered first up to (but not including) last, without copying.
+            Only the newest capacity samples are kept, so first must be at least last - capacity.
+            The views are overwritten once the writer has written another capacity samples, so use or copy them before then.
+        """
+
+        count = last - first
+        end = last % self.capacity + self.capacity
+        return self.times[end - count:end], self.values[end - count:end]
+
+    def get_latest(self, count):
+        """Returns views of the times and values of the newest count samples (or fewer if not enough have been written)."""
+
+        written = self.get_written()
+        count = min(count, written, self.capacity)
+        return self.get_range(written - count, written)
+
+    def close(self):
+        """Stops using the shared memory in this process."""
+
+        self.header = None
+        self.times = None
+        self.values = None
+        self.memory.close()
+
+    def unlink(self):
+        """Removes the shared memory. Only called by the process that created it, after closing it."""
+        self.memory.unlink()
+
+
+class SharedSampleReader():
+    """Reads the samples written to a shared sample ring since it last read, keeping its own position so any number of readers can share one ring."""
+
+    def __init__(self, name=DEFAULT_NAME, from_start=False):
+
+        self.ring = SharedSampleRing.attach(name)
+
+        # Number of the next sample to read. New readers start at the newest sample unless from_start is True
+        if from_start:
+            self.position = max(self.ring.get_written() - self.ring.capacity, 0)
+        else:
+            self.position = self.ring.get_written()
+
+        # Amount of samples overwritten before this reader got to them
+        self.missed_samples = 0
+
+    def read_new(self):
+        """Returns views of the times and values of every sample written since the last call, oldest first."""
+
+        written = self.ring.get_written()
+
+        # Skip samples that have already been overwritten
+        if written - self.position > self.ring.capacity:
+            self.missed_samples += written - self.ring.capacity - self.position
+            self.position = written - self.ring.capacity
+
+        times, values = self.ring.get_range(self.position, written)
+        self.position = written
+
+        return times, values
+
+    def close(self):
+        """Stops reading from the ring."""
+        self.ring.close()
+
+
+
+#################### MAIN ROUTINE ####################
+if __name__ == "__main__":
+
+    # Print every sample shared by a running data transmitter, as comma separated values
+    parser = argparse.ArgumentParser(description="Print samples shared by a data transmitter")
+    parser.add_argument("--name", default=DEFAULT_NAME, help="name the samples are shared under")
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between checks for new samples")
+    args = parser.parse_args()
+
+    reader = SharedSampleReader(args.name)
+    print("time,pressure")
+
+    times = values = None
+    try:
+        while True:
+            times, values = reader.read_new()
+            for sample_time, pressure in zip(times, values):
+                print("{:.3f},{:.2f}".format(sample_time, pressure))
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Views must be released before the shared memory can be closed
+        times = values = None
+        reader.close()
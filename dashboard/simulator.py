@@ -0,0 +1,242 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+# Pretends to be an Arduino running tsunamiAlarm_v2.ino on a virtual serial port, so the dashboard can be tested without hardware
+# Uses a pseudo-terminal, so only runs on Linux and macOS
+
+#################### IMPORTS ####################
+from arduino_data import BinaryFrameParser
+from detector import WATER_DENSITY, GRAVITY_FORCE
+import binascii
+import argparse
+import random
+import select
+import math
+import time
+import tty
+import os
+
+
+class WaveScenario():
+    """
+        Generates the pressure a sensor under the water would measure over time.
+
+        The water height is the standing depth, plus an optional swell (a sine wave), plus an optional tsunami,
+        a step up in water height that arrives tsunami_time seconds after the start. Sensor noise is added to the pressure,
+        and a fraction of samples can be dropped, as if they were lost on the serial line.
+    """
+
+    SCENARIOS = ("still", "swell", "tsunami")
+
+    def __init__(self, scenario="still", air_pressure=1013.25, depth=10, swell_height=2, swell_period=8,
+                 tsunami_height=20, tsunami_time=30, tsunami_rise=2, noise=0.05, dropout=0, seed=None):
+
+        if scenario not in self.SCENARIOS:
+            raise ValueError("Scenario must be one of " + ", ".join(self.SCENARIOS))
+        self.scenario = scenario
+
+        # Air pressure in hPa, and water heights in cm
+        self.air_pressure = air_pressure
+        self.depth = depth
+        self.swell_height = swell_height if scenario in ("swell", "tsunami") else 0
+        self.swell_period = swell_period
+        self.tsunami_height = tsunami_height
+
+        # Seconds after the start the tsunami arrives (None if there is no tsunami), and the seconds it takes to reach its full height
+        self.tsunami_time = tsunami_time if scenario == "tsunami" else None
+        self.tsunami_rise = tsunami_rise
+
+        # Standard deviation of the sensor noise in hPa, and the chance of each sample being dropped
+        self.noise = noise
+        self.dropout = dropout
+
+        self.random = random.Random(seed)
+
+    def get_water_height(self, t):
+        """Gets the water height in cm above the sensor t seconds after the start."""
+
+        water_height = self.depth + self.swell_height / 2 * math.sin(2 * math.pi * t / self.swell_period)
+
+        if self.tsunami_time != None and t >= self.tsunami_time:
+            rise = min((t - self.tsunami_time) / self.tsunami_rise, 1) if self.tsunami_rise > 0 else 1
+            water_height += self.tsunami_height * rise
+
+        return water_height
+
+    def get_pressure(self, t, extra_height=0):
+        """Gets the pressure in hPa measured t seconds after the start, with the water extra_height cm higher, or None if the sample is dropped."""
+
+        if self.dropout > 0 and self.random.random() < self.dropout:
+            return None
+
+        # P = P0 + pgh, with h converted from cm to m and the result converted from Pa to hPa
+        pressure = self.air_pressure + WATER_DENSITY * GRAVITY_FORCE * ((self.get_water_height(t) + extra_height) / 100) / 100
+        return pressure + self.random.gauss(0, self.noise) if self.noise > 0 else pressure
+
+
+class SerialSimulator():
+    """
+        A virtual serial port that sends readings from a WaveScenario in the same format as tsunamiAlarm_v2.ino, at any sample rate.
+        Connect the data transmitter to port. "ALARM" commands sent to the port are counted in alarm_times.
+    """
+
+    # Longest time in seconds the simulator waits at a time, so it can check if it should stop
+    WAIT_INTERVAL = 0.05
+
+    def __init__(self, scenario, rate=10, framing="text", verbose=True):
+
+        if framing not in ("text", "binary"):
+            raise ValueError("Framing must be 'text' or 'binary'")
+        self.scenario = scenario
+        self.rate = rate
+        self.framing = framing
+
+        # Whether to print when an alarm is received
+        self.verbose = verbose
+
+        # Create pseudo-terminal - the simulator writes to the master end, and the data transmitter opens the slave end as a serial port
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        # Amount of samples generated (including dropped ones), which is also the sequence number of the next sample
+        self.samples_generated = 0
+
+        # Time the first sample at or after the tsunami arrival was sent, in seconds since the epoch
+        self.tsunami_sent_time = None
+
+        # Spike requested by inject_spike() as (height, length), and the sample numbers the current spike starts and ends at
+        self.pending_spike = None
+        self.spike_height = 0
+        self.spike_start = 0
+        self.spike_end = 0
+
+        # Times the first sample of each spike was sent, in seconds since the epoch
+        self.spike_sent_times = []
+
+        # Times "ALARM" was received, in seconds since the epoch
+        self.alarm_times = []
+        self.received = b""
+
+        self.break_loop = False
+
+    def encode_sample(self, sequence_number, device_time, pressure):
+        """Encodes a sample the way tsunamiAlarm_v2.ino sends it."""
+
+        if self.framing == "binary":
+            contents = BinaryFrameParser.CONTENTS.pack(sequence_number % 65536, device_time % 2**32, pressure)
+            return BinaryFrameParser.SYNC + contents + binascii.crc_hqx(contents, 0xFFFF).to_bytes(2, "little")
+
+        # Serial.println prints floats with 2 decimal places
+        return "{},{},{:.2f}\r\n".format(device_time, sequence_number % 65536, pressure).encode()
+
+    def run(self, length=None):
+        """Sends samples until stop() is called, or for length seconds if given."""
+
+        start = time.monotonic()
+
+        while not self.break_loop:
+
+            elapsed = time.monotonic() - start
+            if length != None and elapsed >= length:
+                break
+
+            # Start a requested spike from the next sample
+            if self.pending_spike != None:
+                height, spike_length = self.pending_spike
+                self.pending_spike = None
+                self.spike_height = height
+                self.spike_start = self.samples_generated
+                self.spike_end = self.samples_generated + max(int(spike_length * self.rate), 1)
+
+            # Send every sample that is due in one write
+            due = int(elapsed * self.rate) + 1
+            data = []
+            spike_started = False
+            tsunami_started = False
+            while self.samples_generated < due:
+                if self.samples_generated == self.spike_start and self.spike_end > self.spike_start:
+                    spike_started = True
+                t = self.samples_generated / self.rate
+                extra_height = self.spike_height if self.spike_start <= self.samples_generated < self.spike_end else 0
+                pressure = self.scenario.get_pressure(t, extra_height)
+                if pressure != None:
+                    data.append(self.encode_sample(self.samples_generated, int(t * 1000), pressure))
+                if self.tsunami_sent_time == None and self.scenario.tsunami_time != None and t >= self.scenario.tsunami_time:
+                    tsunami_started = True
+                self.samples_generated += 1
+
+            if data:
+                os.write(self.master, b"".join(data))
+
+            # Times are taken once the samples have been written to the port
+            if spike_started:
+                self.spike_sent_times.append(time.time())
+            if tsunami_started:
+                self.tsunami_sent_time = time.time()
+
+            # Wait until the next sample is due, reading any commands sent in the meantime
+            wait = min(max(self.samples_generated / self.rate - (time.monotonic() - start), 0), self.WAIT_INTERVAL)
+            readable, writable, exceptional = select.select([self.master], [], [], wait)
+            if readable:
+                self.receive_commands(os.read(self.master, 1024))
+
+    def inject_spike(self, height, length):
+        """Raises the water by height cm for length seconds, starting from the next sample sent. Can be called from another thread."""
+        self.pending_spike = (height, length)
+
+    def receive_commands(self, data):
+        """Counts every "ALARM" command in data received from the data transmitter."""
+
+        self.received += data
+        while b"ALARM" in self.received:
+            self.alarm_times.append(time.time())
+            self.received = self.received[self.received.index(b"ALARM") + len(b"ALARM"):]
+            if self.verbose:
+                print("Simulator: ALARM received", flush=True)
+
+        # Only keep enough to match a command split across reads
+        self.received = self.received[-(len(b"ALARM") - 1):]
+
+    def stop(self):
+        """Stops sending samples."""
+        self.break_loop = True
+
+    def close(self):
+        """Closes the virtual serial port."""
+
+        os.close(self.master)
+        os.close(self.slave)
+
+
+
+#################### MAIN ROUTINE ####################
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Simulate a tsunami sensor on a virtual serial port")
+    parser.add_argument("--scenario", choices=WaveScenario.SCENARIOS, default="still", help="what the water does")
+    parser.add_argument("--rate", type=float, default=10, help="samples sent per second")
+    parser.add_argument("--framing", choices=["text", "binary"], default="text", help="format to send samples in")
+    parser.add_argument("--depth", type=float, default=10, help="standing water height above the sensor in cm")
+    parser.add_argument("--swell-height", type=float, default=2, help="height of the swell in cm, from trough to crest")
+    parser.add_argument("--swell-period", type=float, default=8, help="seconds between swell crests")
+    parser.add_argument("--tsunami-height", type=float, default=20, help="height the tsunami raises the water by in cm")
+    parser.add_argument("--tsunami-time", type=float, default=30, help="seconds after starting that the tsunami arrives")
+    parser.add_argument("--noise", type=float, default=0.05, help="standard deviation of the sensor noise in hPa")
+    parser.add_argument("--dropout", type=float, default=0, help="fraction of samples lost on the serial line")
+    parser.add_argument("--length", type=float, help="seconds to run for (runs until stopped if not given)")
+    args = parser.parse_args()
+
+    scenario = WaveScenario(args.scenario, depth=args.depth, swell_height=args.swell_height, swell_period=args.swell_period,
+                            tsunami_height=args.tsunami_height, tsunami_time=args.tsunami_time, noise=args.noise, dropout=args.dropout)
+    simulator = SerialSimulator(scenario, rate=args.rate, framing=args.framing)
+    print("Simulating a {} sensor on {} - run main.py --port {} --framing {}".format(args.scenario, simulator.port, simulator.port, args.framing),
+          flush=True)
+
+    try:
+        simulator.run(args.length)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.close()
+        print("Sent {} samples, received {} alarms".format(simulator.samples_generated, len(simulator.alarm_times)))
@@ -0,0 +1,85 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+from collections import deque
+import numpy as np
+import json
+import time
+
+class StageTimers():
+    """
+        Times stages of the render loop and data loop, keeping the most recent times of each stage to summarise as a histogram.
+
+        Usage: start = timers.start(), then timers.stop("stage name", start) once the stage has finished.
+        When disabled, start() returns None and stop() returns straight away, so the timers can be left in the hot path.
+        Stages can be timed from any thread.
+    """
+
+    # Upper edges of the histogram buckets in milliseconds (the last bucket holds everything slower)
+    BUCKET_EDGES = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250)
+
+    def __init__(self, enabled=False, window=1000):
+
+        self.enabled = enabled
+
+        # Amount of recent times kept for each stage
+        self.window = window
+
+        # Recent times of each stage in seconds, oldest first
+        self.stage_times = {}
+
+    def start(self):
+        """Gets the time a stage started, or None if the timers are disabled."""
+
+        if not self.enabled: return None
+        return time.perf_counter()
+
+    def stop(self, stage, start):
+        """Records the time taken by a stage, given the time it started from start()."""
+
+        if start == None: return
+        self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, duration):
+        """Records a time in seconds for a stage."""
+
+        times = self.stage_times.get(stage)
+        if times == None:
+            times = self.stage_times.setdefault(stage, deque(maxlen=self.window))
+        times.append(duration)
+
+    def get_summary(self):
+        """
+            Summarises the recent times of every stage. Returns a dictionary of stage name to the amount of times, the mean,
+            50th percentile, 99th percentile and maximum in milliseconds, and the amount of times in each histogram bucket.
+        """
+
+        summary = {}
+
+        for stage, times in list(self.stage_times.items()):
+
+            times = np.array(times) * 1000
+            if len(times) == 0: continue
+
+            counts = np.bincount(np.searchsorted(self.BUCKET_EDGES, times), minlength=len(self.BUCKET_EDGES) + 1)
+            summary[stage] = {"count": len(times), "mean_ms": float(times.mean()), "p50_ms": float(np.percentile(times, 50)),
+                              "p99_ms": float(np.percentile(times, 99)), "max_ms": float(times.max()),
+                              "histogram": {"bucket_edges_ms": list(self.BUCKET_EDGES), "counts": counts.tolist()}}
+
+        return summary
+
+    def format_summary(self):
+        """Formats the summary of every stage as lines of text, for showing on screen."""
+
+        lines = ["{:<22} {:>8} {:>8} {:>8}".format("Stage", "p50 ms", "p99 ms", "max ms")]
+        for stage, stats in self.get_summary().items():
+            lines.append("{:<22} {:>8.2f} {:>8.2f} {:>8.2f}".format(stage, stats["p50_ms"], stats["p99_ms"], stats["max_ms"]))
+
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Writes the summary of every stage to a file as JSON."""
+
+        with open(path, "w") as dump_file:
+            json.dump({"time": time.time(), "stages": self.get_summary()}, dump_file, indent=4)
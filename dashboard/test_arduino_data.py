@@ -0,0 +1,171 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+from arduino_data import BinaryFrameParser, DeviceClock, DataTransmitter
+import numpy as np
+import binascii
+import unittest
+import struct
+import random
+
+
+def encode_frame(sequence_number, device_millis, pressure):
+    """Encodes a frame the way tsunamiAlarm_v2.ino does with BINARY_FRAMING on."""
+
+    contents = BinaryFrameParser.CONTENTS.pack(sequence_number, device_millis, pressure)
+    return BinaryFrameParser.SYNC + contents + struct.pack("<H", binascii.crc_hqx(contents, 0xFFFF))
+
+
+def feed_in_pieces(parser, data, seed=1):
+    """Feeds data to a parser in randomly sized pieces, like reads from the serial port. Returns every decoded frame."""
+
+    rng = random.Random(seed)
+    frames = []
+    position = 0
+    while position < len(data):
+        length = rng.randint(1, 30)
+        frames += parser.feed(data[position:position + length])
+        position += length
+
+    return frames
+
+
+# Text printed on startup, including bytes that look like the sync bytes
+STARTUP_JUNK = b"boot \xa5\x5a\x01\x02 text\xa5\x5a\xa5\n"
+
+
+class BinaryFrameParserTest(unittest.TestCase):
+
+    def test_resync_after_junk_is_not_corruption(self):
+
+        parser = BinaryFrameParser()
+        data = STARTUP_JUNK + b"".join(encode_frame(number, number * 100, 1013.25) for number in range(20))
+
+        frames = feed_in_pieces(parser, data)
+        self.assertEqual([frame[0] for frame in frames], list(range(20)))
+        self.assertEqual(parser.corrupted_frames, 0)
+
+    def test_damaged_frame_is_counted_once(self):
+
+        # A damaged frame between good frames, with its pressure bytes flipped
+        damaged_frame = bytearray(encode_frame(100, 10000, 1013.25))
+        damaged_frame[8] ^= 0xFF
+
+        data = (STARTUP_JUNK + b"".join(encode_frame(number, number * 100, 1013.25) for number in range(100))
+                + bytes(damaged_frame) + b"".join(encode_frame(number, number * 100, 1013.25) for number in range(101, 150)))
+
+        parser = BinaryFrameParser()
+        frames = feed_in_pieces(parser, data)
+
+        self.assertEqual([frame[0] for frame in frames], list(range(100)) + list(range(101, 150)))
+        self.assertEqual(parser.corrupted_frames, 1)
+
+    def test_frame_split_byte_by_byte(self):
+
+        parser = BinaryFrameParser()
+        frames = []
+        for byte in encode_frame(7, 123456, 1000.5):
+            frames += parser.feed(bytes([byte]))
+
+        self.assertEqual(frames, [(7, 123456, 1000.5)])
+
+
+class DeviceClockTest(unittest.TestCase):
+
+    # Host time the simulated device starts at
+    HOST_START = 1.7e9
+
+    def run_device(self, clock, drift, length, rate=10, start_millis=12345, seed=0):
+        """
+            Simulates a device whose clock runs drift seconds per second fast, sending samples for length seconds, each received
+            between 1 and 30 ms after it was measured. Returns arrays of the true and estimated host times the samples were measured at.
+        """
+
+        rng = np.random.default_rng(seed)
+        true_times = self.HOST_START + np.arange(int(length * rate)) / rate
+        estimated_times = []
+
+        for true_time in true_times:
+            device_millis = (start_millis + int(round((true_time - self.HOST_START) * (1 + drift) * 1000))) % 2**32
+            estimated_times.append(clock.to_host_time(device_millis, true_time + rng.uniform(0.001, 0.03)))
+
+        return true_times, np.array(estimated_times)
+
+    def test_drift_is_estimated(self):
+
+        for drift in (0, 50e-6, -80e-6):
+
+            clock = DeviceClock()
+            true_times, estimated_times = self.run_device(clock, drift, 600)
+
+            # The offset between the clocks shrinks as the device runs fast, so the estimated drift has the opposite sign
+            self.assertAlmostEqual(clock.drift, -drift, delta=10e-6)
+
+            # Once the drift is known, samples are timed to within a few milliseconds, and never after they were received
+            errors = estimated_times[-600:] - true_times[-600:]
+            self.assertGreaterEqual(errors.min(), 0)
+            self.assertLess(errors.max(), 0.005)
+
+    def test_millis_wraparound(self):
+
+        # millis() wraps around 30 seconds into the run
+        clock = DeviceClock()
+        true_times, estimated_times = self.run_device(clock, 0, 60, start_millis=2**32 - 30000)
+
+        self.assertEqual(clock.restarts, 0)
+        self.assertTrue(np.all(np.diff(estimated_times) > 0))
+        self.assertLess(np.abs(estimated_times - true_times).max(), 0.03)
+
+    def test_restart(self):
+
+        clock = DeviceClock()
+        self.run_device(clock, 0, 60, start_millis=500000)
+
+        # The device restarts, so millis() starts again from a small value
+        clock.to_host_time(100, self.HOST_START + 60.02)
+        self.assertEqual(clock.restarts, 1)
+
+        true_times, estimated_times = self.run_device(clock, 0, 30, start_millis=200)
+        self.assertEqual(clock.restarts, 1)
+        self.assertTrue(np.all(np.diff(estimated_times) >= 0))
+
+
+class FakeSerial():
+    """Stands in for a serial port, returning the data it is given from the next read."""
+
+    def __init__(self):
+        self.data = b""
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, size):
+        data, self.data = self.data, b""
+        return data
+
+
+class DroppedSamplesTest(unittest.TestCase):
+
+    def test_restart_does_not_count_dropped_samples(self):
+
+        data_transmitter = DataTransmitter(dashboard=None)
+        data_transmitter.serial_COM = FakeSerial()
+
+        # Samples 0 to 9, with sample 5 lost
+        lines = ["{},{},1013.25\n".format(1000000 + number * 100, number) for number in range(10) if number != 5]
+        data_transmitter.serial_COM.data = "".join(lines).encode()
+        data_transmitter.get_pressure_data()
+        self.assertEqual(data_transmitter.dropped_samples, 1)
+
+        # The Arduino restarts, so its device time and sequence numbers start again from 0
+        lines = ["{},{},1013.25\n".format(50 + number * 100, number) for number in range(5)]
+        data_transmitter.serial_COM.data = "".join(lines).encode()
+        data_transmitter.get_pressure_data()
+        self.assertEqual(data_transmitter.dropped_samples, 1)
+        self.assertEqual(data_transmitter.device_clock.restarts, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+from dashboard import UpdatingGraphFigure
+from sample_buffer import SampleRingBuffer
+from pyramid import TimeSeriesPyramid
+from arduino_data import DataTransmitter
+import numpy as np
+import unittest
+import time
+import os
+
+# Samples per second of the synthetic history - enough to fill the graph's buffers in under 2 hours
+RATE = 10
+
+
+def synthetic_history(length):
+    """Generates length seconds of pressures ending at time 0, with a spike at the start that only the history holds."""
+
+    times = (np.arange(int(length * RATE)) - int(length * RATE)) / RATE
+    pressures = 1013 + np.sin(times / 600)
+    pressures[:RATE] = 1030
+    return times, pressures
+
+
+class UpdatingGraphHistoryTest(unittest.TestCase):
+
+    def test_subplot_uses_history_once_buffer_has_wrapped(self):
+
+        graph = UpdatingGraphFigure(None, 1, 1, capacity=1000)
+        pyramid = TimeSeriesPyramid()
+        graph.set_history_source(0, pyramid)
+
+        times, pressures = synthetic_history(3600)
+        graph.add_data_batch(0, times, pressures)
+        pyramid.add_batch(times, pressures)
+        graph.set_center(0)
+
+        # The buffer reaches back 100 seconds, so a short period is drawn from it and an hour from the history
+        self.assertFalse(graph.uses_history(0, graph.get_x_limits(15)[0]))
+        self.assertTrue(graph.uses_history(0, graph.get_x_limits(3600)[0]))
+
+        graph.update_subplots(3600)
+        x_data = graph.axes_lines[0].get_xdata()
+        self.assertLess(x_data[0], -3500)
+        self.assertEqual(graph.get_history_extremes(0, 3600)[1], 1030)
+
+
+class DashboardHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+
+        from dashboard import Dashboard
+        from tkinter import TclError
+
+        # The dashboard loads its images relative to its directory
+        self.working_directory = os.getcwd()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+        try:
+            self.dashboard = Dashboard("History test", data_transmitter=DataTransmitter(dashboard=None))
+        except TclError as error:
+            os.chdir(self.working_directory)
+            self.skipTest("the dashboard could not be opened ({})".format(error))
+
+    def tearDown(self):
+
+        self.dashboard.destroy()
+        os.chdir(self.working_directory)
+
+    def test_pressure_graph_uses_history_once_buffer_has_wrapped(self):
+
+        dashboard = self.dashboard
+
+        # More samples than the pressure graph's buffer holds
+        length = SampleRingBuffer.DEFAULT_CAPACITY / RATE + 3600
+        times, pressures = synthetic_history(length)
+        dashboard.new_pressure_batch(time.time() + times, pressures)
+
+        dashboard.history_span_var.set("6 hours")
+        dashboard.history_span_change("6 hours")
+        dashboard.graph.set_center(time.time() - dashboard.init_time)
+
+        x_lim_left = dashboard.graph.get_x_limits(dashboard.get_graph_period())[0]
+        self.assertTrue(dashboard.graph.uses_history(0, x_lim_left))
+
+        # The spike at the start of the history is only in the pressure history, so it widens the y limits
+        dashboard.last_statistics_state = None
+        dashboard.update_statistics()
+        self.assertGreaterEqual(dashboard.pressure_subplot.get_ylim()[1], 1030)
+
+
+if __name__ == "__main__":
+    unittest.main()
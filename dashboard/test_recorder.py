@@ -0,0 +1,72 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+from recorder import SampleRecorder, BackgroundRecorder, RecordingReader
+import numpy as np
+import subprocess
+import tempfile
+import unittest
+import sys
+import os
+
+# Records samples, then exits without closing the recorder or syncing, as if the process had crashed
+CRASH_SCRIPT = """
+import sys, os
+from recorder import SampleRecorder
+recorder = SampleRecorder(sys.argv[1], chunk_size=8, sync_interval=3600)
+recorder.append_batch([(float(sample), 1000.0 + sample) for sample in range(int(sys.argv[2]), int(sys.argv[3]))])
+os._exit(0)
+"""
+
+
+class RecorderCrashTest(unittest.TestCase):
+
+    def record_then_crash(self, directory, first_sample, end_sample):
+        """Records samples first_sample to end_sample in a separate process that crashes before syncing."""
+
+        subprocess.run([sys.executable, "-c", CRASH_SCRIPT, directory, str(first_sample), str(end_sample)],
+                       cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+    def test_samples_survive_crash_and_restart(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            # The first run crashes part way through its second chunk, and the second run crashes part way through its first chunk
+            self.record_then_crash(directory, 0, 12)
+            self.record_then_crash(directory, 12, 15)
+
+            # The third run closes normally
+            recorder = SampleRecorder(directory, chunk_size=8)
+            recorder.append_batch([(float(sample), 1000.0 + sample) for sample in range(15, 20)])
+            recorder.close()
+
+            reader = RecordingReader(directory)
+            times, pressures = reader.read()
+            np.testing.assert_array_equal(times, np.arange(20, dtype=np.float64))
+            np.testing.assert_array_equal(pressures, 1000.0 + np.arange(20))
+            self.assertEqual(reader.get_time_range(), (0.0, 19.0))
+
+            # Time ranges use the rebuilt index entries of the crashed chunks
+            times, pressures = reader.read(9, 13)
+            np.testing.assert_array_equal(times, np.arange(9, 14, dtype=np.float64))
+
+
+class BackgroundRecorderTest(unittest.TestCase):
+
+    def test_every_queued_sample_is_recorded_on_close(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            recorder = BackgroundRecorder(directory, chunk_size=64)
+            for batch in range(50):
+                recorder.append_batch([(float(sample), 1000.0 + sample) for sample in range(batch * 10, batch * 10 + 10)])
+            recorder.close()
+
+            times, pressures = RecordingReader(directory).read()
+            np.testing.assert_array_equal(times, np.arange(500, dtype=np.float64))
+            np.testing.assert_array_equal(pressures, 1000.0 + np.arange(500))
+
+
+if __name__ == "__main__":
+    unittest.main()
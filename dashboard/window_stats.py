@@ -0,0 +1,79 @@
+# St. Bernard's College 183z Team
+# CRISiSLab Challenge 2024
+
+#################### IMPORTS ####################
+from collections import deque
+
+class SlidingWindowStats():
+    """
+        Streaming minimum, maximum and latest value of the samples in a sliding time window.
+        Samples are added as they arrive and expired as the window slides past them, both in O(1) amortised time.
+    """
+
+    def __init__(self):
+
+        # Every sample in the window as (sample number, time, value), oldest first
+        self.samples = deque()
+
+        # Monotonic deques of (sample number, value). The front of each deque is the minimum/maximum of the window
+        self.min_deque = deque()
+        self.max_deque = deque()
+
+        # Number given to the next sample added
+        self.next_sample_number = 0
+
+    def add(self, time, value):
+        """Add a sample to the end of the window. Samples must be added in time order."""
+
+        sample_number = self.next_sample_number
+        self.next_sample_number += 1
+
+        self.samples.append((sample_number, time, value))
+
+        # Remove samples from the back that can never be the minimum/maximum while this sample is in the window
+        while self.min_deque and self.min_deque[-1][1] >= value:
+            self.min_deque.pop()
+        self.min_deque.append((sample_number, value))
+
+        while self.max_deque and self.max_deque[-1][1] <= value:
+            self.max_deque.pop()
+        self.max_deque.append((sample_number, value))
+
+    def add_batch(self, times, values):
+        """Add arrays of samples to the end of the window, in time order."""
+
+        for time, value in zip(times.tolist(), values.tolist()):
+            self.add(time, value)
+
+    def expire(self, min_time):
+        """Remove every sample recorded before min_time from the window."""
+
+        while self.samples and self.samples[0][1] < min_time:
+
+            sample_number, time, value = self.samples.popleft()
+
+            if self.min_deque[0][0] == sample_number:
+                self.min_deque.popleft()
+            if self.max_deque[0][0] == sample_number:
+                self.max_deque.popleft()
+
+    def rebuild(self, times, values):
+        """Replace every sample in the window. Used when the window grows to include samples that have already been expired."""
+
+        self.samples.clear()
+        self.min_deque.clear()
+        self.max_deque.clear()
+
+        self.add_batch(times, values)
+
+    def get_min(self):
+        """Gets the minimum value in the window, or None if the window is empty."""
+        return self.min_deque[0][1] if self.min_deque else None
+
+    def get_max(self):
+        """Gets the maximum value in the window, or None if the window is empty."""
+        return self.max_deque[0][1] if self.max_deque else None
+
+    def get_latest(self):
+        """Gets the newest value in the window, or None if the window is empty."""
+        return self.samples[-1][2] if self.samples else None